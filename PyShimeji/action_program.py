@@ -0,0 +1,272 @@
+from expressions import compile_condition, compile_expression, test, ExpressionError
+
+# Instructions are tuples whose first item is the opcode:
+#   (OP_PLAY, action name, kind, duration, target x, target y, params)
+#                                                              play a primitive action
+#   (OP_LOOK, look right)                                      face a direction (None: turn around)
+#   (OP_OFFSET, x, y)                                          move by x, y
+#   (OP_JUMP, pc)
+#   (OP_SKIP_UNLESS, condition, pc)                            jump to pc unless condition holds
+#   (OP_END,)
+# Operands that come from the XML (duration, targets...) are callables taking an
+# Environment, or None when the attribute is absent. `params` holds one such
+# operand per name in KIND_PARAMS for the kind (empty for most kinds).
+OP_PLAY, OP_LOOK, OP_OFFSET, OP_JUMP, OP_SKIP_UNLESS, OP_END = range(6)
+
+# What a primitive action makes the mascot do
+KIND_WALK = "walk"
+KIND_STAND = "stand"
+KIND_CLING = "cling"
+KIND_CLIMB = "climb"
+KIND_JUMP = "jump"
+KIND_FALL = "fall"
+KIND_CEILING = "ceiling"  # not supported; ends the program
+KIND_CARRY = "carry"  # walk holding the active window (WalkWithIE)
+KIND_CARRY_FALL = "carry_fall"  # fall holding it (FallWithIE)
+KIND_THROW_WINDOW = "throw_window"  # throw it away (ThrowIE)
+
+KIND_PLACEMENT = {
+    KIND_WALK: "floor",
+    KIND_STAND: "floor",
+    KIND_JUMP: "floor",
+    KIND_CLING: "wall",
+    KIND_CLIMB: "wall",
+    KIND_CARRY: "floor",
+    KIND_THROW_WINDOW: "floor",
+}
+
+# Extra parameters of the window actions, in the order they are evaluated
+KIND_PARAMS = {
+    KIND_CARRY: ("IeOffsetX", "IeOffsetY"),
+    KIND_CARRY_FALL: ("IeOffsetX", "IeOffsetY"),
+    KIND_THROW_WINDOW: ("InitialVX", "InitialVY", "Gravity"),
+}
+
+# Instructions a runner may execute in one call before giving up (Loop="true" with no actions)
+MAX_STEPS = 256
+
+
+def leaf_kind(action):
+    """Kind of a primitive action, "look"/"offset" for those embedded actions, or
+    None for embedded actions the engine doesn't implement (they are skipped)."""
+    if action['type'] == "Embedded":
+        cls = (action.get('class') or "").rsplit('.', 1)[-1]
+        return {"Look": "look", "Offset": "offset", "Jump": KIND_JUMP, "Fall": KIND_FALL,
+                "WalkWithIE": KIND_CARRY, "FallWithIE": KIND_CARRY_FALL, "ThrowIE": KIND_THROW_WINDOW}.get(cls)
+    moving = action['type'] == "Move"
+    border = action['border']
+    if border == "Wall":
+        return KIND_CLIMB if moving else KIND_CLING
+    if border == "Ceiling":
+        return KIND_CEILING
+    return KIND_WALK if moving else KIND_STAND
+
+
+def _constant(value):
+    return lambda env: value
+
+
+def _param(params, key):
+    """Compiled callable for a parameter value, or None if absent or unusable."""
+    raw = params.get(key)
+    if raw is None:
+        return None
+    raw = raw.strip()
+    if raw.startswith(("#{", "${")):
+        try:
+            return compile_expression(raw)
+        except ExpressionError as e:
+            print(f"Ignoring {key}: {e}")
+            return None
+    if raw in ("true", "false"):
+        return _constant(raw == "true")
+    try:
+        return _constant(float(raw))
+    except ValueError:
+        print(f"Ignoring {key}: {raw!r}")
+        return None
+
+
+class Program:
+    """An action tree flattened into a list of instructions.
+
+    Sequences are laid out in order, Select alternatives become conditional
+    skips, ActionReferences are inlined with their parameters and loops become
+    jumps, so running it costs the same however deeply the XML is nested.
+    `placement` is where the first physical action happens ("floor"/"wall"),
+    None if the program can't start anywhere the engine supports.
+    """
+
+    def __init__(self, name, code):
+        self.name = name
+        self.code = code
+        self.placement = None
+        for op in code:
+            if op[0] == OP_PLAY:
+                self.placement = KIND_PLACEMENT.get(op[2])
+                break
+
+    def __len__(self):
+        return len(self.code)
+
+
+class _Compiler:
+    def __init__(self, actions):
+        self.actions = actions
+        self.code = []
+
+    def emit(self, op):
+        self.code.append(op)
+        return len(self.code) - 1
+
+    def node(self, node, params, stack, conditioned=True):
+        """Emits an action node (named action or nested anonymous one)."""
+        skip = None
+        if conditioned and node.get('condition'):
+            skip = self.emit(None)
+
+        node_type = node.get('type')
+        if node_type == "Sequence":
+            start = len(self.code)
+            for child in node['children']:
+                self.child(child, stack)
+            if node['loop']:
+                self.emit((OP_JUMP, start))
+        elif node_type == "Select":
+            # First alternative whose condition holds
+            exits = []
+            for child in node['children']:
+                alt_skip = self.emit(None) if child.get('condition') else None
+                self.child(child, stack, conditioned=False)
+                exits.append(self.emit(None))
+                if alt_skip is not None:
+                    self.code[alt_skip] = (OP_SKIP_UNLESS, compile_condition(child['condition']), len(self.code))
+            for i in exits:
+                self.code[i] = (OP_JUMP, len(self.code))
+        else:
+            self.leaf(node, params, stack[-1])
+
+        if skip is not None:
+            self.code[skip] = (OP_SKIP_UNLESS, compile_condition(node['condition']), len(self.code))
+
+    def child(self, child, stack, conditioned=True):
+        if 'ref' not in child:
+            self.node(child, {}, stack, conditioned)
+            return
+        name = child['ref']
+        target = self.actions.get(name)
+        if target is None:
+            print(f"Unknown action reference: {name}")
+            return
+        if name in stack:
+            print(f"Recursive action reference: {' -> '.join(stack + [name])}")
+            return
+        skip = None
+        if conditioned and child.get('condition'):
+            skip = self.emit(None)
+        params = dict(target.get('params', {}))
+        params.update(child['params'])
+        self.node(target, params, stack + [name])
+        if skip is not None:
+            self.code[skip] = (OP_SKIP_UNLESS, compile_condition(child['condition']), len(self.code))
+
+    def leaf(self, action, params, name):
+        kind = leaf_kind(action) if 'border' in action else None
+        if kind == "look":
+            self.emit((OP_LOOK, _param(params, 'LookRight')))
+        elif kind == "offset":
+            self.emit((OP_OFFSET, _param(params, 'X') or _constant(0), _param(params, 'Y') or _constant(0)))
+        elif kind is not None:
+            duration = _param(params, 'Duration')
+            if duration is None and (action['type'] == "Animate" or kind == KIND_THROW_WINDOW):
+                # Animate (and ThrowIE, an Animate underneath) runs its animation once
+                duration = _constant(sum(f['duration'] for f in action['frames']))
+            extra = tuple(_param(params, key) for key in KIND_PARAMS.get(kind, ()))
+            self.emit((OP_PLAY, name, kind, duration, _param(params, 'TargetX'), _param(params, 'TargetY'), extra))
+
+
+def compile_program(name, actions):
+    compiler = _Compiler(actions)
+    compiler.node(actions[name], dict(actions[name].get('params', {})), [name])
+    compiler.emit((OP_END,))
+    return Program(name, compiler.code)
+
+
+def compile_programs(actions):
+    """A Program for every named action."""
+    return {name: compile_program(name, actions) for name in actions}
+
+
+class ActionRunner:
+    """Steps one mascot through a Program.
+
+    The runner only holds a program counter and the current action's evaluated
+    parameters; nothing is allocated while stepping, except the `params` tuple of
+    the window actions. The mascot decides when the current action is done
+    (duration elapsed, target reached) and calls next_leaf() to move on.
+    Look/Offset instructions call host.look(look_right) and host.offset(dx, dy).
+    """
+
+    __slots__ = ("program", "pc", "action", "kind", "elapsed", "duration", "target_x", "target_y", "params")
+
+    def __init__(self):
+        self.program = None
+        self.pc = 0
+        self.clear()
+
+    def clear(self):
+        self.action = None
+        self.kind = None
+        self.elapsed = 0.0
+        self.duration = None
+        self.target_x = None
+        self.target_y = None
+        self.params = ()
+
+    def start(self, program):
+        self.program = program
+        self.pc = 0
+        self.clear()
+
+    def next_leaf(self, env, host):
+        """Runs up to the next action to play. Returns False when the program is finished."""
+        self.clear()
+        if self.program is None:
+            return False
+        code = self.program.code
+        for _ in range(MAX_STEPS):
+            op = code[self.pc]
+            opcode = op[0]
+            self.pc += 1
+            if opcode == OP_PLAY:
+                self.action = op[1]
+                self.kind = op[2]
+                self.duration = _evaluate(op[3], env)
+                self.target_x = _evaluate(op[4], env)
+                self.target_y = _evaluate(op[5], env)
+                if op[6]:
+                    self.params = tuple(_evaluate(fn, env) for fn in op[6])
+                return True
+            if opcode == OP_SKIP_UNLESS:
+                if not test(op[1], env):
+                    self.pc = op[2]
+            elif opcode == OP_JUMP:
+                self.pc = op[1]
+            elif opcode == OP_LOOK:
+                host.look(_evaluate(op[1], env))
+            elif opcode == OP_OFFSET:
+                host.offset(_evaluate(op[1], env) or 0, _evaluate(op[2], env) or 0)
+            else: # OP_END
+                break
+        self.program = None
+        return False
+
+
+def _evaluate(fn, env):
+    if fn is None:
+        return None
+    try:
+        return fn(env)
+    except (ArithmeticError, TypeError):
+        return None
+
@@ -0,0 +1,157 @@
+from PyQt6.QtCore import QObject, QBuffer, QByteArray, QIODevice
+from PyQt6.QtMultimedia import QAudio, QAudioFormat, QAudioSink, QMediaDevices
+
+DEFAULT_MAX_VOICES = 8
+
+SAMPLE_FORMATS = {
+    1: QAudioFormat.SampleFormat.UInt8,
+    2: QAudioFormat.SampleFormat.Int16,
+    4: QAudioFormat.SampleFormat.Int32,
+}
+
+
+class Voice:
+    """One output stream: a QAudioSink playing a QBuffer over a shared PCM block."""
+
+    def __init__(self, fmt_key, audio_format, volume, parent):
+        self.fmt_key = fmt_key
+        self.sink = QAudioSink(QMediaDevices.defaultAudioOutput(), audio_format, parent)
+        self.sink.setVolume(volume)
+        self.buffer = QBuffer(parent)
+        self.started = 0  # play counter value when started, for stealing the oldest
+
+    def is_busy(self):
+        return self.sink.state() == QAudio.State.ActiveState
+
+    def play(self, pcm, started):
+        self.stop()
+        self.buffer.setData(pcm)
+        self.buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        self.started = started
+        self.sink.start(self.buffer)
+
+    def stop(self):
+        self.sink.stop()
+        if self.buffer.isOpen():
+            self.buffer.close()
+
+    def dispose(self):
+        self.stop()
+        self.sink.deleteLater()
+        self.buffer.deleteLater()
+
+
+class AudioEngine(QObject):
+    """Process-wide sound playback.
+
+    Each pack's sounds are registered once as in-memory PCM (decoded when the pack
+    is compiled) and played through a shared pool of at most `max_voices` sinks,
+    so any number of mascots costs the same number of audio handles. Volume is
+    applied once, centrally. When every voice is busy the oldest one is reused.
+    """
+
+    def __init__(self, max_voices=DEFAULT_MAX_VOICES, parent=None):
+        super().__init__(parent)
+        self.max_voices = max_voices
+        self.volume = 0.5
+        self._sounds = {}  # (pack hash, lower-case name) -> (format key, QByteArray)
+        self._formats = {}  # format key -> QAudioFormat
+        self._voices = []
+        self._plays = 0
+        self.dropped = 0
+
+    # --- Sound registry ---
+
+    def register_pack(self, pack_hash, sounds):
+        """Adds a pack's sounds: name -> (format dict, pcm bytes)."""
+        for name, (fmt, pcm) in sounds.items():
+            sample_format = SAMPLE_FORMATS.get(fmt['width'])
+            if sample_format is None:
+                print(f"Unsupported sample width in {name}: {fmt['width']} bytes")
+                continue
+            fmt_key = (fmt['channels'], fmt['rate'], fmt['width'])
+            if fmt_key not in self._formats:
+                audio_format = QAudioFormat()
+                audio_format.setChannelCount(fmt['channels'])
+                audio_format.setSampleRate(fmt['rate'])
+                audio_format.setSampleFormat(sample_format)
+                self._formats[fmt_key] = audio_format
+            # Pose XML and zip entries don't always agree on case ("sit.wav" vs "sit.WAV")
+            self._sounds[(pack_hash, name.lower())] = (fmt_key, QByteArray(pcm))
+
+    def unregister_pack(self, pack_hash):
+        for key in [k for k in self._sounds if k[0] == pack_hash]:
+            del self._sounds[key]
+
+    def has_sound(self, pack_hash, name):
+        return (pack_hash, name.lower()) in self._sounds
+
+    # --- Playback ---
+
+    def play(self, pack_hash, name):
+        sound = self._sounds.get((pack_hash, name.lower()))
+        if sound is None:
+            return False
+        fmt_key, pcm = sound
+        voice = self._acquire_voice(fmt_key)
+        self._plays += 1
+        voice.play(pcm, self._plays)
+        return True
+
+    def _acquire_voice(self, fmt_key):
+        # Idle voice with the right format, else a new one, else steal the oldest
+        idle = None
+        for voice in self._voices:
+            if not voice.is_busy():
+                if voice.fmt_key == fmt_key:
+                    return voice
+                idle = idle or voice
+        if len(self._voices) < self.max_voices:
+            voice = Voice(fmt_key, self._formats[fmt_key], self.volume, self)
+            self._voices.append(voice)
+            return voice
+
+        # Pool is full: replace an idle voice of another format, or the oldest playing one
+        victim = idle or min(self._voices, key=lambda v: v.started)
+        if victim is not idle:
+            self.dropped += 1
+        victim.dispose()
+        self._voices.remove(victim)
+        voice = Voice(fmt_key, self._formats[fmt_key], self.volume, self)
+        self._voices.append(voice)
+        return voice
+
+    def set_volume(self, volume):
+        self.volume = volume
+        for voice in self._voices:
+            voice.sink.setVolume(volume)
+
+    def set_max_voices(self, max_voices):
+        self.max_voices = max(1, max_voices)
+        while len(self._voices) > self.max_voices:
+            self._voices.pop(0).dispose()
+
+    def stop_all(self):
+        for voice in self._voices:
+            voice.stop()
+
+    def stats(self):
+        return {
+            'sounds': len(self._sounds),
+            'voices': len(self._voices),
+            'busy_voices': sum(1 for v in self._voices if v.is_busy()),
+            'max_voices': self.max_voices,
+            'plays': self._plays,
+            'dropped': self.dropped,
+        }
+
+
+_shared_engine = None
+
+
+def shared_engine():
+    """The process-wide audio engine."""
+    global _shared_engine
+    if _shared_engine is None:
+        _shared_engine = AudioEngine()
+    return _shared_engine
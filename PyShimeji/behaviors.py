@@ -0,0 +1,142 @@
+import random
+from expressions import compile_condition, test
+
+class AliasTable:
+    """Walker/Vose alias table: weighted sampling in O(1) after an O(n) build."""
+
+    def __init__(self, items, weights):
+        n = len(items)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("alias table needs at least one positive weight")
+        self.items = list(items)
+        self.prob = [0.0] * n
+        self.alias = [0] * n
+
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Leftovers are 1.0 up to rounding
+        for i in large + small:
+            self.prob[i] = 1.0
+
+    def sample(self, rng=random):
+        u = rng.random() * len(self.items)
+        i = int(u)
+        if u - i < self.prob[i]:
+            return self.items[i]
+        return self.items[self.alias[i]]
+
+
+class Behavior:
+    """One behavior from behaviors.xml. `placement` is where its action program
+    starts ("floor" or "wall"), None for behaviors the engine can't perform
+    (ceilings, embedded Java actions)."""
+
+    def __init__(self, name, frequency, conditions, placement):
+        self.name = name
+        self.frequency = frequency
+        self.conditions = conditions # compiled condition callables
+        self.placement = placement
+
+
+class _SuccessorList:
+    """Candidate behaviors for one node, grouped by placement and condition set.
+
+    Sampling evaluates each group's conditions once, and the alias table for
+    the resulting group mask is built once and reused, so a transition costs
+    O(groups) condition checks plus an O(1) draw however many candidates there are.
+    """
+
+    def __init__(self, candidates):
+        # candidates: (behavior name, weight, placement, compiled condition tuple)
+        groups = {}
+        for name, weight, placement, conditions in candidates:
+            if weight > 0:
+                groups.setdefault((placement, conditions), []).append((name, weight))
+        self.groups = list(groups.items())
+        self._tables = {}  # group mask -> AliasTable, or None if nothing is eligible
+
+    def table_for(self, mask):
+        try:
+            return self._tables[mask]
+        except KeyError:
+            pass
+        items, weights = [], []
+        for i, (_, members) in enumerate(self.groups):
+            if mask & (1 << i):
+                for name, weight in members:
+                    items.append(name)
+                    weights.append(weight)
+        table = AliasTable(items, weights) if items else None
+        self._tables[mask] = table
+        return table
+
+    def sample(self, env, placement, rng):
+        mask = 0
+        for i, ((group_placement, conditions), _) in enumerate(self.groups):
+            if group_placement != placement:
+                continue
+            for condition in conditions:
+                if not test(condition, env):
+                    break
+            else:
+                mask |= 1 << i
+        table = self.table_for(mask)
+        return table.sample(rng) if table is not None else None
+
+
+class BehaviorGraph:
+    """The behaviors.xml graph compiled for sampling.
+
+    Behaviors without a NextBehavior list (and those with Add="true") draw from
+    the global pool of every behavior with a Frequency; Add="false" lists draw
+    only from their own references. Each behavior plays the action program of the
+    same name; behaviors the engine can't perform are left out of every list.
+    """
+
+    def __init__(self, behaviors_data, programs):
+        self.behaviors = {}
+        for data in behaviors_data:
+            program = programs.get(data['name'])
+            placement = program.placement if program is not None else None
+            conditions = tuple(compile_condition(c) for c in data['conditions'])
+            self.behaviors[data['name']] = Behavior(data['name'], data['frequency'], conditions, placement)
+
+        pool = [(b.name, b.frequency, b.placement, b.conditions) for b in self.behaviors.values()
+                if b.placement is not None]
+        self.pool = _SuccessorList(pool)
+        self.successors = {}  # behavior name -> _SuccessorList (absent: uses the pool)
+        for data in behaviors_data:
+            next_behaviors = data['next']
+            if next_behaviors is None:
+                continue
+            candidates = []
+            for ref in next_behaviors['refs']:
+                target = self.behaviors.get(ref['name'])
+                if target is None or target.placement is None:
+                    continue
+                extra = (compile_condition(ref['condition']),) if ref['condition'] else ()
+                candidates.append((target.name, ref['frequency'], target.placement, target.conditions + extra))
+            if next_behaviors['add']:
+                candidates += pool
+            self.successors[data['name']] = _SuccessorList(candidates)
+
+    def __len__(self):
+        return len(self.behaviors)
+
+    def sample_next(self, current, env, placement, rng=random):
+        """Next Behavior after `current` (None starts from the pool) that can be
+        played at `placement` ("floor" or "wall") and whose conditions hold for the
+        Environment snapshot `env`, or None if there is none."""
+        successors = self.successors.get(current, self.pool)
+        name = successors.sample(env, placement, rng)
+        return self.behaviors[name] if name is not None else None
+
@@ -0,0 +1,377 @@
+"""Micro-benchmarks for PyShimeji hot paths.
+
+Run from the PyShimeji folder:  python benchmark.py
+Runs on Linux: Qt is offscreen and monitors/windows come from fake sources.
+  python benchmark.py --json results.json                  save the results
+  python benchmark.py --compare baseline.json --threshold 0.25
+                                                          fail on timings 25% slower
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import platform
+import shutil
+import tempfile
+import time
+from edge_index import EdgeIndex, WALL_MARGIN, FLOOR_TOLERANCE
+from sample_data import synthetic_windows, bundled_zips
+
+
+# Reference implementations: the linear scans the edge index replaced
+
+def linear_wall_at(windows, x, y, dx, ignore_hwnd=None):
+    for hwnd, rect, title in windows:
+        if hwnd == ignore_hwnd: continue
+        left, top, right, bottom = rect
+        if top < y < bottom:
+            if dx > 0 and abs(x - left) < WALL_MARGIN: return ('Right', left, hwnd)
+            if dx < 0 and abs(x - right) < WALL_MARGIN: return ('Left', right, hwnd)
+    return None
+
+
+def linear_floor_at(windows, foot_x, foot_y, ignore_hwnd=None):
+    for hwnd, rect, title in windows:
+        if hwnd == ignore_hwnd: continue
+        left, top, right, bottom = rect
+        if left <= foot_x <= right:
+            if abs(foot_y - top) < FLOOR_TOLERANCE:
+                return (hwnd, rect)
+    return None
+
+
+def _time_queries(fn, queries, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for q in queries:
+            fn(*q)
+        best = min(best, time.perf_counter() - start)
+    return best / len(queries)
+
+
+def bench_collision(window_counts=(10, 80, 200, 500), query_count=5000, seed=2):
+    """Linear scan vs EdgeIndex for wall and floor queries, the swept queries for
+    the long steps of a 10 FPS tick, and the full Desktop queries the physics makes
+    (get_vertical_wall_collision, get_window_under_foot) against a fake desktop.
+    Returns a list of result dicts."""
+    from desktop import Desktop
+    from window_source import FakeWindowSource
+    from monitor_topology import FakeMonitorTopology
+    rng = random.Random(seed)
+    results = []
+    for count in window_counts:
+        windows = synthetic_windows(count)
+        index = EdgeIndex(windows)
+        desktop = Desktop(FakeWindowSource(windows), lambda: FakeMonitorTopology.DUAL_1080P)
+        walls = [(rng.uniform(0, 3840), rng.uniform(0, 1080), rng.choice((-4, 4)))
+                 for _ in range(query_count)]
+        floors = [(rng.uniform(0, 3840), rng.uniform(0, 1080)) for _ in range(query_count)]
+        # Falling/thrown steps at 10 FPS (time_scale 3): up to MAX_FALL_SPEED * 3 px
+        swept_walls = [(x, y, dx * 30, rng.uniform(-60, 120)) for x, y, dx in walls]
+        swept_floors = [(fx, fy, fx + rng.uniform(-60, 60), fy + rng.uniform(0, 120)) for fx, fy in floors]
+
+        # Both paths must agree before timing means anything
+        for x, y, dx in walls:
+            assert index.wall_at(x, y, dx) == linear_wall_at(windows, x, y, dx)
+        for fx, fy in floors:
+            assert index.floor_at(fx, fy) == linear_floor_at(windows, fx, fy)
+
+        results.append({
+            'windows': count,
+            'wall_linear_us': _time_queries(lambda x, y, dx: linear_wall_at(windows, x, y, dx), walls) * 1e6,
+            'wall_index_us': _time_queries(index.wall_at, walls) * 1e6,
+            'floor_linear_us': _time_queries(lambda fx, fy: linear_floor_at(windows, fx, fy), floors) * 1e6,
+            'floor_index_us': _time_queries(index.floor_at, floors) * 1e6,
+            'wall_swept_us': _time_queries(index.wall_crossed, swept_walls) * 1e6,
+            'floor_swept_us': _time_queries(index.floor_crossed, swept_floors) * 1e6,
+            'wall_desktop_us': _time_queries(lambda x, y, dx: desktop.get_vertical_wall_collision(x, y, dx, 0), walls) * 1e6,
+            'floor_desktop_us': _time_queries(lambda fx, fy: desktop.get_window_under_foot(fx, fy, 0), floors) * 1e6,
+        })
+    return results
+
+
+def bench_pack_load(zip_paths=None):
+    """Cold (compile to cache) vs warm (load from cache) pack loading, in a throwaway cache dir."""
+    import pack_cache  # needs PyQt6.QtGui
+    from pack_data import PackData
+    results = []
+    cache_dir = tempfile.mkdtemp()
+    try:
+        for zip_path in zip_paths or bundled_zips():
+            start = time.perf_counter()
+            compiled, built = pack_cache.load_or_build(zip_path, cache_dir)
+            cold = time.perf_counter() - start
+            compiled.close()
+            assert built
+
+            start = time.perf_counter()
+            compiled, built = pack_cache.load_or_build(zip_path, cache_dir)
+            warm = time.perf_counter() - start
+            assert not built
+
+            # Action table, animations, programs and behavior graph (built on the GUI thread)
+            start = time.perf_counter()
+            PackData(compiled)
+            tables = time.perf_counter() - start
+            compiled.close()
+
+            results.append({'pack': os.path.basename(zip_path), 'cold_ms': cold * 1000,
+                            'warm_ms': warm * 1000, 'tables_ms': tables * 1000})
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return results
+
+
+CONDITION_TEMPLATES = (
+    "#{mascot.environment.cursor.y < mascot.environment.screen.height/%d}",
+    "#{FootX < mascot.environment.cursor.x-%d}",
+    "#{mascot.anchor.x >= mascot.environment.workArea.left+%d && mascot.environment.floor.isOn(mascot.anchor)}",
+    "#{mascot.lookRight ? mascot.anchor.x < mascot.environment.activeIE.left+%d : mascot.environment.activeIE.topBorder.isOn(mascot.anchor)}",
+    "#{Math.abs(mascot.environment.workArea.bottom-mascot.anchor.y) < mascot.environment.workArea.height/%d}",
+)
+
+
+def synthetic_conditions(count, seed=3):
+    """Distinct condition scripts shaped like the ones in the bundled actions/behaviors.xml."""
+    rng = random.Random(seed)
+    conditions = set()
+    while len(conditions) < count:
+        conditions.add(rng.choice(CONDITION_TEMPLATES) % rng.randint(1, 100000))
+    return sorted(conditions)
+
+
+def bench_conditions(condition_counts=(100, 300, 1000), ticks=200, seed=4):
+    """Per-tick cost of evaluating N compiled conditions against a changing snapshot,
+    next to the one-off compile cost and what re-parsing every tick would cost."""
+    import expressions
+    rng = random.Random(seed)
+    results = []
+    for count in condition_counts:
+        sources = synthetic_conditions(count)
+        expressions._compiled.clear()
+        start = time.perf_counter()
+        compiled = [expressions.compile_condition(src) for src in sources]
+        compile_s = time.perf_counter() - start
+
+        env = expressions.Environment()
+        env.set_work_area(0, 0, 1920, 1030)
+        env.set_active_window((400, 300, 1200, 900))
+        snapshots = [(rng.uniform(0, 1920), rng.uniform(0, 1080), rng.uniform(0, 1920), rng.random() < 0.5)
+                     for _ in range(ticks)]
+        test = expressions.test
+        best = float('inf')
+        for _ in range(3):
+            start = time.perf_counter()
+            for cursor_x, cursor_y, anchor_x, flag in snapshots:
+                env.cursor_x, env.cursor_y, env.anchor_x = cursor_x, cursor_y, anchor_x
+                env.on_floor = env.look_right = flag
+                env.variables['FootX'] = anchor_x
+                for fn in compiled:
+                    test(fn, env)
+            best = min(best, time.perf_counter() - start)
+        per_tick = best / ticks
+
+        # Baseline: translating and compiling every condition again each tick
+        sample = sources[:50]
+        start = time.perf_counter()
+        for src in sample:
+            eval(compile(f"lambda e: {expressions.to_python(src)}", "<shimeji script>", "eval"),
+                 {"__builtins__": {}, "math": expressions.math, "abs": abs, "min": min, "max": max})(env)
+        reparse_per_tick = (time.perf_counter() - start) / len(sample) * count
+
+        results.append({
+            'conditions': count,
+            'compile_ms': compile_s * 1000,
+            'tick_us': per_tick * 1e6,
+            'per_condition_ns': per_tick / count * 1e9,
+            'reparse_tick_us': reparse_per_tick * 1e6,
+        })
+    return results
+
+
+def bench_game_loop(mascot_counts=(1, 10, 100, 500), ticks=100, warmup=100, seed=5):
+    """Headless game_loop throughput against a fake desktop with 20 windows, per
+    mascot count."""
+    import sim
+    packs = sim.load_packs(bundled_zips())
+    results = []
+    for count in mascot_counts:
+        desktop = sim.build_desktop(20, seed=seed)
+        mascots = sim.create_mascots(packs, count, desktop, {"fps": 30, "sound": False}, seed)
+        sim.run(mascots, warmup) # Past the initial drop
+        r = sim.run(mascots, ticks)
+        results.append({
+            'mascots': count,
+            'tick_us': r['seconds'] / ticks * 1e6,
+            'mascot_tick_us': r['seconds'] / (ticks * count) * 1e6,
+            'ticks_per_second': r['ticks_per_second'],
+        })
+    return results
+
+
+def bench_render(zip_path=None, ticks=500):
+    """update_animation on an offscreen Mascot widget, standing still vs turning
+    around every tick (each turn swaps the pixmap and mask)."""
+    from PyQt6.QtWidgets import QApplication
+    from mascot import Mascot
+    import sim
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    mascot = Mascot(zip_path or bundled_zips()[0], {"sound": False}, 0, sim.build_desktop(0))
+    state = mascot.sim
+    results = []
+    try:
+        for mode in ("steady", "flip"):
+            state.set_action("Stand")
+            state.render_stats['repaints'] = state.render_stats['repaints_skipped'] = 0
+            start = time.perf_counter()
+            for _ in range(ticks):
+                if mode == "flip":
+                    state.facing_right = not state.facing_right
+                state.update_animation()
+            elapsed = time.perf_counter() - start
+            results.append({
+                'mode': mode,
+                'update_us': elapsed / ticks * 1e6,
+                'repaints': state.render_stats['repaints'],
+            })
+    finally:
+        mascot.close()
+    return results
+
+
+BENCHMARKS = {
+    'collision': bench_collision,
+    'conditions': bench_conditions,
+    'pack_load': bench_pack_load,
+    'game_loop': bench_game_loop,
+    'render': bench_render,
+}
+
+# Fields that identify a result row within its benchmark
+KEY_FIELDS = ('windows', 'conditions', 'pack', 'mascots', 'mode')
+# Timings of the reference implementations, not of PyShimeji code
+REFERENCE_FIELDS = ('wall_linear_us', 'floor_linear_us', 'reparse_tick_us')
+
+
+def run_benchmarks(names=None):
+    """Runs the named benchmarks (all by default). A benchmark whose dependencies
+    are missing is skipped and listed under 'skipped'."""
+    report = {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': {},
+        'skipped': {},
+    }
+    for name in names or BENCHMARKS:
+        try:
+            report['results'][name] = BENCHMARKS[name]()
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+            report['skipped'][name] = str(e)
+    return report
+
+
+def _row_key(row):
+    return tuple((field, row[field]) for field in KEY_FIELDS if field in row)
+
+
+def compare(baseline, current, threshold=0.25):
+    """Timings in `current` more than `threshold` (a fraction) slower than the
+    matching row in `baseline`. Returns (benchmark, row key, field, old, new) tuples."""
+    regressions = []
+    for name, rows in current['results'].items():
+        old_rows = {_row_key(row): row for row in baseline['results'].get(name, ())}
+        for row in rows:
+            old = old_rows.get(_row_key(row))
+            if old is None:
+                continue
+            for field, value in row.items():
+                if not field.endswith(('_us', '_ms')) or field in REFERENCE_FIELDS:
+                    continue
+                before = old.get(field)
+                if before and value > before * (1 + threshold):
+                    regressions.append((name, _row_key(row), field, before, value))
+    return regressions
+
+
+def print_report(report):
+    results = report['results']
+    if 'collision' in results:
+        print(f"{'windows':>8} {'wall lin':>10} {'wall idx':>10} {'wall swept':>10} {'wall desk':>10} "
+              f"{'floor lin':>10} {'floor idx':>10} {'floor swpt':>10} {'floor desk':>10}  (us/query)")
+        for r in results['collision']:
+            print(f"{r['windows']:>8} {r['wall_linear_us']:>10.2f} {r['wall_index_us']:>10.2f} "
+                  f"{r['wall_swept_us']:>10.2f} {r['wall_desktop_us']:>10.2f} {r['floor_linear_us']:>10.2f} "
+                  f"{r['floor_index_us']:>10.2f} {r['floor_swept_us']:>10.2f} {r['floor_desktop_us']:>10.2f}")
+        print()
+
+    if 'conditions' in results:
+        print(f"{'conditions':>10} {'compile ms':>11} {'tick us':>10} {'ns/cond':>8} {'reparse us':>11}")
+        for r in results['conditions']:
+            print(f"{r['conditions']:>10} {r['compile_ms']:>11.1f} {r['tick_us']:>10.1f} "
+                  f"{r['per_condition_ns']:>8.0f} {r['reparse_tick_us']:>11.0f}")
+        print()
+
+    if 'pack_load' in results:
+        print(f"{'pack':>16} {'cold ms':>10} {'warm ms':>10} {'tables ms':>10}")
+        for r in results['pack_load']:
+            print(f"{r['pack']:>16} {r['cold_ms']:>10.1f} {r['warm_ms']:>10.1f} {r['tables_ms']:>10.1f}")
+        print()
+
+    if 'game_loop' in results:
+        print(f"{'mascots':>8} {'tick us':>10} {'us/mascot':>10} {'ticks/s':>9}")
+        for r in results['game_loop']:
+            print(f"{r['mascots']:>8} {r['tick_us']:>10.0f} "
+                  f"{r['mascot_tick_us']:>10.1f} {r['ticks_per_second']:>9.0f}")
+        print()
+
+    if 'render' in results:
+        print(f"{'render':>8} {'update us':>10} {'repaints':>9}")
+        for r in results['render']:
+            print(f"{r['mode']:>8} {r['update_us']:>10.1f} {r['repaints']:>9}")
+        print()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PyShimeji micro-benchmarks.")
+    parser.add_argument("benchmarks", nargs="*", metavar="NAME",
+                        help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--json", metavar="PATH", help="write the results to a JSON file")
+    parser.add_argument("--compare", metavar="PATH", help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown against the baseline, as a fraction (default 0.25)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+
+    # No display needed; Qt renders offscreen
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    report = run_benchmarks(args.benchmarks)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.json}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        for name, key, field, before, after in regressions:
+            where = ", ".join(f"{k}={v}" for k, v in key)
+            print(f"REGRESSION {name} [{where}] {field}: {before:.2f} -> {after:.2f} "
+                  f"(+{(after / before - 1) * 100:.0f}%)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold * 100:.0f}% against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
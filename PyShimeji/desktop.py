@@ -0,0 +1,203 @@
+from time import perf_counter
+from monitor_topology import MonitorTopology
+from edge_index import EdgeIndex
+from window_source import WindowTracker
+from mascot_grid import MascotGrid
+from instruments import shared_instruments
+
+_instruments = shared_instruments()
+
+
+class Desktop:
+    """Monitors and top-level windows as the physics sees them.
+
+    `screen_source` is a callable returning the monitor rects and `window_source`
+    a WindowSource, so the same queries run against the real desktop (see
+    WindowManager) or an in-memory one (FakeWindowSource plus a fixed screen list)
+    without any window system. The mascots themselves are found through
+    `mascot_grid`.
+    """
+
+    def __init__(self, window_source, screen_source):
+        self.window_source = window_source
+        self.screen_source = screen_source
+        self._topology = None
+        self._tracker = None
+        self._window_cache = []
+        self._edge_index = EdgeIndex()
+        self.windows_version = 0 # Bumped whenever the window cache changes
+        self.mascot_grid = MascotGrid() # Mascots on this desktop, rebuilt once per frame
+        self._window_rects = None # hwnd -> rect for the current cache, built on demand
+        self._pending_moves = {} # hwnd -> [dx right, dx left, dy down, dy up] requested this frame
+
+    # --- Monitors ---
+
+    def get_topology(self):
+        """Returns the cached monitor layout, building it on first use or after invalidation."""
+        if self._topology is None:
+            if _instruments.enabled:
+                _instruments.count("topology_cache.miss")
+            self._topology = MonitorTopology(self.screen_source())
+        return self._topology
+
+    def set_topology(self, topology):
+        """Replaces the monitor layout (e.g. with a FakeMonitorTopology)."""
+        self._topology = topology
+
+    def invalidate_topology(self):
+        """Drops the cached layout; called when screens are added, removed or resized."""
+        self._topology = None
+        # Fullscreen filtering depends on the layout
+        if self._tracker is not None:
+            self._tracker.request_resync()
+
+    def get_screens_info(self):
+        return self.get_topology().screens
+
+    def get_screen_at(self, x, y):
+        return self.get_topology().screen_at(x, y)
+
+    def get_floor_at(self, x, y):
+        return self.get_topology().floor_at(x, y)
+
+    def is_x_in_any_monitor(self, x, buffer=5):
+        return self.get_topology().is_x_in_any_monitor(x, buffer)
+
+    # --- Windows ---
+
+    def is_trackable(self, rect):
+        """Size and fullscreen filter applied to every tracked window."""
+        w = rect[2] - rect[0]
+        h = rect[3] - rect[1]
+        if w <= 50 or h <= 50:
+            return False
+        # Fullscreen window matches or exceeds the bounds of any monitor
+        for s in self.get_topology().screens:
+            if rect[0] <= s[0] and rect[1] <= s[1] and rect[2] >= s[2] and rect[3] >= s[3]:
+                return False
+        return True
+
+    def set_window_source(self, source):
+        """Swaps the window backend; the cache is rebuilt from it."""
+        self.shutdown()
+        self.window_source = source
+        self._pending_moves = {}
+
+    def get_tracker(self):
+        if self._tracker is None:
+            self._tracker = WindowTracker(self.window_source, self.is_trackable)
+        return self._tracker
+
+    def shutdown(self):
+        """Stops the window source (removes event hooks)."""
+        if self._tracker is not None:
+            self._tracker.stop()
+            self._tracker = None
+
+    def update_cache(self):
+        """Brings the window cache up to date, excluding fullscreen and tiny windows.
+
+        Applies pending window events (cheap, nothing to do on an idle desktop); a full
+        enumeration only runs as the tracker's periodic fallback.
+        """
+        start = perf_counter() if _instruments.enabled else None
+        tracker = self.get_tracker()
+        tracker.refresh()
+        if start is not None:
+            _instruments.record("update_cache", start)
+        self._take_cache(tracker)
+
+    def _take_cache(self, tracker):
+        if tracker.edge_index is not self._edge_index:
+            self.windows_version += 1
+            self._window_rects = None
+        self._window_cache = tracker.windows
+        self._edge_index = tracker.edge_index
+
+    def get_windows(self):
+        self.update_cache()
+        return self._window_cache
+
+    def get_window_rect(self, hwnd):
+        """Cached rect of a tracked window, or None."""
+        if self._window_rects is None:
+            self._window_rects = {w[0]: w[1] for w in self._window_cache}
+        return self._window_rects.get(hwnd)
+
+    # --- Moving windows ---
+
+    def request_window_move(self, hwnd, dx, dy):
+        """Asks for a window to be moved by (dx, dy) at the end of the frame.
+
+        Requests for the same window are coalesced: pushes the same way don't add
+        up (the largest wins), opposite ones cancel out.
+        """
+        move = self._pending_moves.get(hwnd)
+        if move is None:
+            move = self._pending_moves[hwnd] = [0, 0, 0, 0]
+        if dx > move[0]: move[0] = dx
+        if dx < move[1]: move[1] = dx
+        if dy > move[2]: move[2] = dy
+        if dy < move[3]: move[3] = dy
+
+    def flush_window_moves(self):
+        """Submits the frame's window moves to the window source as one batch,
+        computed from the cached rects, and patches the cache to match."""
+        if not self._pending_moves:
+            return
+        pending, self._pending_moves = self._pending_moves, {}
+        moves = []
+        for hwnd, (right, left, down, up) in pending.items():
+            rect = self.get_window_rect(hwnd)
+            if rect is None:
+                continue # Closed or no longer tracked
+            dx = int(round(right + left))
+            dy = int(round(down + up))
+            if dx or dy:
+                moves.append((hwnd, (rect[0] + dx, rect[1] + dy, rect[2] + dx, rect[3] + dy)))
+        if not moves:
+            return
+        if _instruments.enabled:
+            _instruments.count("window_moves.requested", len(pending))
+            _instruments.count("window_moves.batched", len(moves))
+        self.window_source.move_windows(moves)
+        tracker = self.get_tracker()
+        tracker.apply_moves(dict(moves))
+        self._take_cache(tracker)
+
+    def get_window_under_foot(self, foot_x, foot_y, current_hwnd_to_ignore, velocity_y=0):
+        # Only snap if falling
+        if velocity_y < 0: return None
+
+        self.update_cache()
+        return self._edge_index.floor_at(foot_x, foot_y, current_hwnd_to_ignore)
+
+    def get_window_crossed(self, x0, y0, x1, y1, current_hwnd_to_ignore):
+        """Window top crossed by the foot moving from (x0, y0) to (x1, y1), as
+        (hwnd, rect, t) (see EdgeIndex.floor_crossed), or None."""
+        self.update_cache()
+        return self._edge_index.floor_crossed(x0, y0, x1, y1, current_hwnd_to_ignore)
+
+    def get_vertical_wall_collision(self, x, y, dx, current_hwnd_to_ignore, dy=0):
+        """Wall met moving from (x, y) by (dx, dy), as (side, x, is_sky, is_window, hwnd)
+        (hwnd None for monitor edges), or None."""
+        self.update_cache()
+        target_x = x + dx
+
+        # Check if target_x is within ANY monitor's X-range (the "Sky")
+        # Use a small buffer to handle rounding/tiny gaps
+        found_next_space = self.is_x_in_any_monitor(target_x, buffer=5)
+
+        if not found_next_space:
+            curr_s = self.get_screen_at(x, y)
+            # Check if we are above the monitor (Sky)
+            is_sky = y < curr_s[1]
+            # Return: (Side, X, is_sky, is_window)
+            if dx < 0: return ('Left', curr_s[0], is_sky, False, None)
+            else: return ('Right', curr_s[2], is_sky, False, None)
+
+        # Window Edges from the sorted index (Only if NOT in sky), swept over the whole move
+        hit = self._edge_index.wall_crossed(x, y, dx, dy, current_hwnd_to_ignore)
+        if hit:
+            return (hit[0], hit[1], False, True, hit[2])
+        return None
@@ -0,0 +1,131 @@
+from bisect import bisect_left, bisect_right
+
+# Tolerances shared with the physics in simulation.py
+WALL_MARGIN = 25
+FLOOR_TOLERANCE = 15
+
+
+class EdgeIndex:
+    """Sorted window edges for wall and floor queries.
+
+    Built from the window cache ((hwnd, rect, title) tuples, topmost first). Left and
+    right edges are sorted by x and top edges by y, each keeping its span and the
+    window's position in the cache, so a query bisects to the margin window and
+    still returns the same (topmost) window a linear scan would.
+
+    wall_at/floor_at test a point; wall_crossed/floor_crossed test the segment a
+    mascot moves along in one tick, so that long steps (low FPS, fast throws)
+    can't pass through an edge between two point tests.
+    """
+
+    def __init__(self, windows=()):
+        lefts, rights, tops = [], [], []
+        for order, (hwnd, rect, title) in enumerate(windows):
+            left, top, right, bottom = rect
+            lefts.append((left, order, top, bottom, hwnd, rect))
+            rights.append((right, order, top, bottom, hwnd, rect))
+            tops.append((top, order, left, right, hwnd, rect))
+        lefts.sort()
+        rights.sort()
+        tops.sort()
+        self._lefts, self._left_keys = lefts, [e[0] for e in lefts]
+        self._rights, self._right_keys = rights, [e[0] for e in rights]
+        self._tops, self._top_keys = tops, [e[0] for e in tops]
+
+    def __len__(self):
+        return len(self._tops)
+
+    @staticmethod
+    def _first_match(edges, keys, pos, margin, span_check, ignore):
+        # Edges strictly within (pos - margin, pos + margin); the lowest cache order wins
+        best = None
+        start = bisect_right(keys, pos - margin)
+        end = bisect_left(keys, pos + margin)
+        for i in range(start, end):
+            edge = edges[i]
+            if edge[4] == ignore:
+                continue
+            if best is not None and edge[1] >= best[1]:
+                continue
+            if span_check(edge[2], edge[3]):
+                best = edge
+        return best
+
+    def wall_at(self, x, y, dx, ignore_hwnd=None, margin=WALL_MARGIN):
+        """Window edge the mascot at (x, y) runs into when moving by dx.
+
+        Returns ('Right', left_edge_x, hwnd) when moving right, ('Left', right_edge_x, hwnd)
+        when moving left, or None.
+        """
+        if dx > 0:
+            edges, keys, side = self._lefts, self._left_keys, 'Right'
+        elif dx < 0:
+            edges, keys, side = self._rights, self._right_keys, 'Left'
+        else:
+            return None
+        hit = self._first_match(edges, keys, x, margin,
+                                lambda top, bottom: top < y < bottom, ignore_hwnd)
+        if hit:
+            return (side, hit[0], hit[4])
+        return None
+
+    def floor_at(self, foot_x, foot_y, ignore_hwnd=None, tolerance=FLOOR_TOLERANCE):
+        """Window whose top edge is within tolerance of the foot, as (hwnd, rect), or None."""
+        hit = self._first_match(self._tops, self._top_keys, foot_y, tolerance,
+                                lambda left, right: left <= foot_x <= right, ignore_hwnd)
+        if hit:
+            return (hit[4], hit[5])
+        return None
+
+    def wall_crossed(self, x, y, dx, dy=0, ignore_hwnd=None, margin=WALL_MARGIN):
+        """Swept wall_at: the first window edge met moving from (x, y) by (dx, dy).
+
+        Edges from `margin` behind x to `margin` past x + dx count; the first one
+        along the direction of motion wins (the topmost window on a tie) and its span is checked at the y
+        where the path crosses it. Returns ('Right'/'Left', edge_x, hwnd) like
+        wall_at, or None.
+        """
+        if dx > 0:
+            edges, keys, side = self._lefts, self._left_keys, 'Right'
+            indices = range(bisect_right(keys, x - margin), bisect_left(keys, x + dx + margin))
+        elif dx < 0:
+            edges, keys, side = self._rights, self._right_keys, 'Left'
+            # Walk right to left so the nearest edge comes first
+            indices = range(bisect_left(keys, x + margin) - 1, bisect_right(keys, x + dx - margin) - 1, -1)
+        else:
+            return None
+        best = None
+        for i in indices:
+            edge = edges[i]
+            if best is not None and edge[0] != best[0]:
+                break # Past the nearest edge that was hit
+            if edge[4] == ignore_hwnd:
+                continue
+            if best is not None and edge[1] >= best[1]:
+                continue
+            t = min(1.0, max(0.0, (edge[0] - x) / dx))
+            if edge[2] < y + dy * t < edge[3]:
+                best = edge
+        if best:
+            return (side, best[0], best[4])
+        return None
+
+    def floor_crossed(self, x0, y0, x1, y1, ignore_hwnd=None):
+        """Window whose top edge the foot crosses moving down from (x0, y0) to (x1, y1).
+
+        Returns (hwnd, rect, t) for the first top crossed (the topmost window on a
+        tie), t being the fraction of the move at the crossing, or None.
+        """
+        if y1 <= y0:
+            return None
+        dx = x1 - x0
+        dy = y1 - y0
+        tops = self._tops
+        for i in range(bisect_right(self._top_keys, y0), bisect_right(self._top_keys, y1)):
+            top, order, left, right, hwnd, rect = tops[i]
+            if hwnd == ignore_hwnd:
+                continue
+            t = (top - y0) / dy
+            if left <= x0 + dx * t <= right:
+                return (hwnd, rect, t)
+        return None
@@ -0,0 +1,282 @@
+import re
+import math
+import random
+
+# Shimeji script paths the evaluator understands -> Environment attribute
+PATHS = {
+    "mascot.anchor.x": "anchor_x",
+    "mascot.anchor.y": "anchor_y",
+    "mascot.lookRight": "look_right",
+    "mascot.totalCount": "total_count",
+    "mascot.environment.cursor.x": "cursor_x",
+    "mascot.environment.cursor.y": "cursor_y",
+    "mascot.environment.cursor.dx": "cursor_dx",
+    "mascot.environment.cursor.dy": "cursor_dy",
+    "mascot.environment.screen.width": "screen_width",
+    "mascot.environment.screen.height": "screen_height",
+    "mascot.environment.workArea.left": "work_left",
+    "mascot.environment.workArea.top": "work_top",
+    "mascot.environment.workArea.right": "work_right",
+    "mascot.environment.workArea.bottom": "work_bottom",
+    "mascot.environment.workArea.width": "work_width",
+    "mascot.environment.workArea.height": "work_height",
+    "mascot.environment.activeIE.visible": "ie_visible",
+    "mascot.environment.activeIE.left": "ie_left",
+    "mascot.environment.activeIE.top": "ie_top",
+    "mascot.environment.activeIE.right": "ie_right",
+    "mascot.environment.activeIE.bottom": "ie_bottom",
+    "mascot.environment.activeIE.width": "ie_width",
+    "mascot.environment.activeIE.height": "ie_height",
+}
+
+# Borders that support .isOn(mascot.anchor) -> Environment attribute
+BORDERS = {
+    "mascot.environment.floor": "on_floor",
+    "mascot.environment.ceiling": "on_ceiling",
+    "mascot.environment.workArea.leftBorder": "on_work_left",
+    "mascot.environment.workArea.rightBorder": "on_work_right",
+    "mascot.environment.activeIE.topBorder": "on_ie_top",
+    "mascot.environment.activeIE.bottomBorder": "on_ie_bottom",
+    "mascot.environment.activeIE.leftBorder": "on_ie_left",
+    "mascot.environment.activeIE.rightBorder": "on_ie_right",
+}
+
+MATH_FUNCTIONS = {
+    "Math.abs": "abs",
+    "Math.min": "min",
+    "Math.max": "max",
+    "Math.floor": "math.floor",
+    "Math.ceil": "math.ceil",
+    "Math.sqrt": "math.sqrt",
+}
+
+TOKEN_RE = re.compile(r"\s*(?:(\d+\.\d*|\.\d+|\d+)|([A-Za-z_][A-Za-z_0-9]*(?:\s*\.\s*[A-Za-z_][A-Za-z_0-9]*)*)|(&&|\|\||==|!=|<=|>=|[-+*/%<>!?:(),]))")
+
+# Binary operators by precedence (lowest first) and their Python spelling
+BINARY_LEVELS = (
+    {"||": "or"},
+    {"&&": "and"},
+    {"==": "==", "!=": "!="},
+    {"<": "<", "<=": "<=", ">": ">", ">=": ">="},
+    {"+": "+", "-": "-"},
+    {"*": "*", "/": "/", "%": "%"},
+)
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+class Environment:
+    """Per-tick snapshot of everything a condition can read.
+
+    Mascots keep one instance and refresh it in place each tick, so evaluating
+    conditions never allocates. `variables` holds action parameters (FootX,
+    TargetY...) and `random` is the mascot's random number source.
+    """
+
+    __slots__ = tuple(PATHS.values()) + tuple(BORDERS.values()) + ("variables", "random")
+
+    def __init__(self):
+        for name in PATHS.values():
+            setattr(self, name, 0)
+        for name in BORDERS.values():
+            setattr(self, name, False)
+        self.look_right = False
+        self.ie_visible = False
+        self.total_count = 1
+        self.variables = {}
+        self.random = random.random
+
+    def set_work_area(self, left, top, right, bottom):
+        self.work_left, self.work_top, self.work_right, self.work_bottom = left, top, right, bottom
+        self.work_width = right - left
+        self.work_height = bottom - top
+
+    def set_active_window(self, rect):
+        if rect is None:
+            self.ie_visible = False
+            return
+        self.ie_visible = True
+        self.ie_left, self.ie_top, self.ie_right, self.ie_bottom = rect
+        self.ie_width = self.ie_right - self.ie_left
+        self.ie_height = self.ie_bottom - self.ie_top
+
+
+def strip_script(source):
+    """The expression inside "#{...}" / "${...}" (plain text is returned as is)."""
+    source = source.strip()
+    if source[:2] in ("#{", "${") and source.endswith("}"):
+        return source[2:-1]
+    return source
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = TOKEN_RE.match(text, pos)
+        if match is None or match.end() == pos:
+            raise ExpressionError(f"unexpected character {text[pos:].lstrip()[:1]!r} in {text!r}")
+        number, name, op = match.groups()
+        if number is not None:
+            tokens.append(("num", number))
+        elif name is not None:
+            tokens.append(("name", re.sub(r"\s+", "", name)))
+        else:
+            tokens.append(("op", op))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive descent parser emitting Python source from whitelisted tokens only."""
+
+    def __init__(self, tokens, source):
+        self.tokens = tokens
+        self.source = source
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, op=None):
+        token = self.peek()
+        if token[0] is None or (op is not None and token != ("op", op)):
+            raise ExpressionError(f"expected {op or 'more input'} in {self.source!r}")
+        self.pos += 1
+        return token
+
+    def parse(self):
+        code = self.ternary()
+        if self.pos != len(self.tokens):
+            raise ExpressionError(f"unexpected {self.peek()[1]!r} in {self.source!r}")
+        return code
+
+    def ternary(self):
+        cond = self.binary(0)
+        if self.peek() == ("op", "?"):
+            self.take("?")
+            then = self.ternary()
+            self.take(":")
+            other = self.ternary()
+            return f"({then} if {cond} else {other})"
+        return cond
+
+    def binary(self, level):
+        if level == len(BINARY_LEVELS):
+            return self.unary()
+        ops = BINARY_LEVELS[level]
+        code = self.binary(level + 1)
+        while self.peek()[0] == "op" and self.peek()[1] in ops:
+            op = ops[self.take()[1]]
+            code = f"({code} {op} {self.binary(level + 1)})"
+        return code
+
+    def unary(self):
+        token = self.peek()
+        if token == ("op", "!"):
+            self.take()
+            return f"(not {self.unary()})"
+        if token == ("op", "-"):
+            self.take()
+            return f"(-{self.unary()})"
+        if token == ("op", "+"):
+            self.take()
+            return self.unary()
+        return self.primary()
+
+    def primary(self):
+        kind, value = self.take()
+        if kind == "num":
+            return repr(float(value)) if "." in value else value
+        if kind == "op" and value == "(":
+            code = self.ternary()
+            self.take(")")
+            return code
+        if kind == "name":
+            return self.name(value)
+        raise ExpressionError(f"unexpected {value!r} in {self.source!r}")
+
+    def args(self):
+        self.take("(")
+        args = []
+        if self.peek() != ("op", ")"):
+            args.append(self.ternary())
+            while self.peek() == ("op", ","):
+                self.take(",")
+                args.append(self.ternary())
+        self.take(")")
+        return args
+
+    def name(self, name):
+        if name in ("true", "false"):
+            return "True" if name == "true" else "False"
+        if name == "Math.random":
+            # Some packs write "Math.random" without the call
+            if self.peek() == ("op", "("):
+                self.args()
+            return "e.random()"
+        if name in MATH_FUNCTIONS:
+            return f"{MATH_FUNCTIONS[name]}({', '.join(self.args())})"
+        if name.endswith(".isOn") and name[:-5] in BORDERS:
+            # Always called with mascot.anchor; the snapshot already answers for the anchor
+            self.take("(")
+            if self.take() != ("name", "mascot.anchor"):
+                raise ExpressionError(f"isOn only supports mascot.anchor in {self.source!r}")
+            self.take(")")
+            return f"e.{BORDERS[name[:-5]]}"
+        if name in PATHS:
+            return f"e.{PATHS[name]}"
+        if "." not in name:
+            # Action parameter (FootX, TargetY...)
+            return f"e.variables.get({name!r}, 0)"
+        raise ExpressionError(f"unknown name {name!r} in {self.source!r}")
+
+
+def to_python(source):
+    """Python expression (over an Environment `e`) equivalent to a Shimeji script."""
+    text = strip_script(source)
+    return _Parser(tokenize(text), text).parse()
+
+
+_compiled = {}  # script source -> callable, shared by every pack
+
+
+def compile_expression(source):
+    """Compiles a "#{...}" / "${...}" script into a callable taking an Environment.
+
+    Only names from PATHS/BORDERS, action parameters and a few Math functions can
+    appear in the generated code, and it runs without builtins. Results are
+    cached by source text. Raises ExpressionError on anything it can't compile.
+    """
+    fn = _compiled.get(source)
+    if fn is None:
+        code = compile(f"lambda e: {to_python(source)}", "<shimeji script>", "eval")
+        fn = eval(code, {"__builtins__": {}, "math": math, "abs": abs, "min": min, "max": max})
+        _compiled[source] = fn
+    return fn
+
+
+def _always_false(env):
+    return False
+
+
+def compile_condition(source):
+    """Like compile_expression, but a script that can't be compiled becomes a
+    condition that is always false (after printing why)."""
+    try:
+        return compile_expression(source)
+    except ExpressionError as e:
+        print(f"Ignoring condition: {e}")
+        _compiled[source] = _always_false
+        return _always_false
+
+
+def test(fn, env):
+    """Evaluates a compiled condition; errors (division by zero...) count as false."""
+    try:
+        return bool(fn(env))
+    except (ArithmeticError, TypeError):
+        return False
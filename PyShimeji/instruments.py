@@ -0,0 +1,157 @@
+import json
+import time
+from bisect import bisect_left
+
+# Histogram bucket upper bounds in microseconds: 1 us to ~4 s, four buckets per doubling
+BUCKET_BOUNDS_US = [2 ** (i / 4) for i in range(88)]
+
+
+class Histogram:
+    """Timing histogram with fixed log-spaced buckets; adding a sample is a bisect.
+    Percentiles are bucket upper bounds (within ~19%)."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_US) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        us = seconds * 1e6
+        self.buckets[bisect_left(BUCKET_BOUNDS_US, us)] += 1
+        self.count += 1
+        self.total += us
+        if us > self.max:
+            self.max = us
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return BUCKET_BOUNDS_US[i] if i < len(BUCKET_BOUNDS_US) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_us': self.total / self.count if self.count else 0.0,
+            'p50_us': self.percentile(50),
+            'p95_us': self.percentile(95),
+            'p99_us': self.percentile(99),
+            'max_us': self.max,
+        }
+
+
+class Instruments:
+    """Runtime-switchable timings and counters for the hot paths.
+
+    Call sites check `enabled` before doing anything, so a disabled layer costs an
+    attribute read:
+
+        start = perf_counter() if inst.enabled else None
+        ...
+        if start is not None:
+            inst.record("game_loop", start)
+
+    Sections are timing histograms, counters count system calls and cache
+    hits/misses, and frame() tracks frames that ran over their budget. Sources
+    added with add_source() (sprite cache, window tracker...) report their own
+    stats into snapshot().
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._sources = {}
+        self.reset()
+
+    def reset(self):
+        self.sections = {}  # name -> Histogram
+        self.counters = {}  # name -> int
+        self.frames = 0
+        self.overruns = 0
+        self.started = time.monotonic()
+
+    def set_enabled(self, enabled):
+        if enabled and not self.enabled:
+            self.reset()
+        self.enabled = enabled
+
+    def record(self, name, start):
+        """Adds the time since `start` (a perf_counter() value) to a section."""
+        elapsed = time.perf_counter() - start
+        hist = self.sections.get(name)
+        if hist is None:
+            hist = self.sections[name] = Histogram()
+        hist.add(elapsed)
+        return elapsed
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def frame(self, start, budget):
+        """Ends a frame that began at `start`; it overran if it took longer than `budget` seconds."""
+        self.frames += 1
+        if self.record("frame", start) > budget:
+            self.overruns += 1
+
+    def add_source(self, name, fn):
+        """Registers a callable returning a dict of stats to include in snapshots."""
+        self._sources[name] = fn
+
+    def snapshot(self):
+        sources = {}
+        for name, fn in self._sources.items():
+            try:
+                sources[name] = fn()
+            except Exception as e:
+                sources[name] = {'error': str(e)}
+        return {
+            'enabled': self.enabled,
+            'seconds': time.monotonic() - self.started,
+            'frames': self.frames,
+            'overruns': self.overruns,
+            'overrun_rate': self.overruns / self.frames if self.frames else 0.0,
+            'sections': {name: hist.summary() for name, hist in sorted(self.sections.items())},
+            'counters': dict(sorted(self.counters.items())),
+            'sources': sources,
+        }
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def format(self):
+        """Plain-text report for the stats panel."""
+        snap = self.snapshot()
+        lines = [f"Instrumentation {'on' if snap['enabled'] else 'off'}, {snap['seconds']:.0f} s, "
+                 f"{snap['frames']} frames, {snap['overruns']} overruns ({snap['overrun_rate'] * 100:.1f}%)",
+                 "",
+                 f"{'section':<24} {'count':>8} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9} {'max us':>9}"]
+        for name, s in snap['sections'].items():
+            lines.append(f"{name:<24} {s['count']:>8} {s['p50_us']:>9.1f} {s['p95_us']:>9.1f} "
+                         f"{s['p99_us']:>9.1f} {s['max_us']:>9.1f}")
+        if snap['counters']:
+            lines += ["", f"{'counter':<32} {'count':>10}"]
+            for name, n in snap['counters'].items():
+                lines.append(f"{name:<32} {n:>10}")
+        for name, stats in snap['sources'].items():
+            lines += ["", f"{name}:"]
+            for key, value in stats.items():
+                value = f"{value:.3f}" if isinstance(value, float) else value
+                lines.append(f"  {key:<30} {value}")
+        return "\n".join(lines)
+
+
+_shared_instruments = None
+
+
+def shared_instruments():
+    """The process-wide instrumentation layer (disabled until switched on)."""
+    global _shared_instruments
+    if _shared_instruments is None:
+        _shared_instruments = Instruments()
+    return _shared_instruments
@@ -3,24 +3,43 @@ import os
 import glob
 import json
 from PyQt6.QtWidgets import (QApplication, QSystemTrayIcon, QMenu, QDialog, 
-                             QVBoxLayout, QCheckBox, QLabel, QSlider, QPushButton, 
-                             QFormLayout, QTextEdit)
-from PyQt6.QtGui import QIcon, QAction
-from PyQt6.QtCore import Qt
+                             QVBoxLayout, QHBoxLayout, QCheckBox, QLabel, QSlider, QPushButton, 
+                             QFormLayout, QTextEdit, QPlainTextEdit, QFileDialog)
+from PyQt6.QtGui import QIcon, QAction, QFontDatabase
+from PyQt6.QtCore import Qt, QTimer
 from mascot import Mascot
+from overlay import OverlayManager
+from pack import MascotPack
+from pack_loader import PackLoader
+from scheduler import MascotScheduler
+from window_manager import WindowManager
+from sprite_cache import shared_cache
+from audio import shared_engine
+from instruments import shared_instruments
 
 CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+STATS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stats.json")
 
 def load_config():
     default = {
         "fps": 30,
+        "physics_hz": 30,
         "sound": True,
         "volume": 50,
         "interact_windows": True,
         "interact_windows": True,
+        "interact_mascots": True,
+        "move_windows": False,
         "blacklisted_windows": ["Program Manager", "Settings"],
         "launch_power_min": 15,
-        "launch_power_max": 25
+        "launch_power_max": 25,
+        "sprite_cache_mb": 64,
+        "instances_per_pack": 1,
+        "audio_voices": 8,
+        "debug_action_table": False,
+        "instrumentation": False,
+        "render_mode": "windows",
+        "adaptive_rate": True
     }
     if os.path.exists(CONFIG_FILE):
         try:
@@ -73,15 +92,24 @@ class SettingsDialog(QDialog):
 
         layout = QFormLayout()
         
-        # FPS
+        # FPS (how often mascots are drawn)
         self.fps_slider = QSlider(Qt.Orientation.Horizontal)
         self.fps_slider.setRange(10, 60)
         self.fps_slider.setValue(self.config.get("fps", 30))
         self.fps_label = QLabel(f"{self.fps_slider.value()} FPS")
         self.fps_slider.valueChanged.connect(lambda v: self.fps_label.setText(f"{v} FPS"))
-        layout.addRow("Framerate:", self.fps_label)
+        layout.addRow("Render Rate:", self.fps_label)
         layout.addRow(self.fps_slider)
 
+        # Physics Rate (how often mascots move and think)
+        self.physics_slider = QSlider(Qt.Orientation.Horizontal)
+        self.physics_slider.setRange(15, 60)
+        self.physics_slider.setValue(self.config.get("physics_hz", 30))
+        self.physics_label = QLabel(f"{self.physics_slider.value()} Hz")
+        self.physics_slider.valueChanged.connect(lambda v: self.physics_label.setText(f"{v} Hz"))
+        layout.addRow("Physics Rate:", self.physics_label)
+        layout.addRow(self.physics_slider)
+
         # Volume
         self.vol_slider = QSlider(Qt.Orientation.Horizontal)
         self.vol_slider.setRange(0, 100)
@@ -118,6 +146,14 @@ class SettingsDialog(QDialog):
         self.win_chk = QCheckBox("Interact with Windows (Walk/Drag)")
         self.win_chk.setChecked(self.config.get("interact_windows", True))
         layout.addRow(self.win_chk)
+
+        self.mascot_chk = QCheckBox("Interact with other Mascots (Bump/Stack)")
+        self.mascot_chk.setChecked(self.config.get("interact_mascots", True))
+        layout.addRow(self.mascot_chk)
+
+        self.move_chk = QCheckBox("Let Mascots push and carry Windows around")
+        self.move_chk.setChecked(self.config.get("move_windows", False))
+        layout.addRow(self.move_chk)
         
         # Startup Checkbox (Registry)
         self.startup_chk = QCheckBox("Run on Windows Startup")
@@ -152,11 +188,14 @@ class SettingsDialog(QDialog):
 
     def apply_settings(self):
         self.config["fps"] = self.fps_slider.value()
+        self.config["physics_hz"] = self.physics_slider.value()
         self.config["volume"] = self.vol_slider.value()
         self.config["launch_power_min"] = self.launch_min_slider.value()
         self.config["launch_power_max"] = self.launch_max_slider.value()
         self.config["sound"] = self.sound_chk.isChecked()
         self.config["interact_windows"] = self.win_chk.isChecked()
+        self.config["interact_mascots"] = self.mascot_chk.isChecked()
+        self.config["move_windows"] = self.move_chk.isChecked()
         self.config["blacklisted_windows"] = [line for line in self.blacklist_edit.toPlainText().split('\n') if line.strip()]
         
         # Apply startup
@@ -167,6 +206,61 @@ class SettingsDialog(QDialog):
             self.on_apply()
         self.accept()
 
+class StatsDialog(QDialog):
+    """Live view of the instrumentation layer, refreshed every second."""
+
+    def __init__(self, instruments):
+        super().__init__()
+        self.instruments = instruments
+        self.setWindowTitle("PyShimeji Stats")
+        self.setWindowFlags(Qt.WindowType.WindowStaysOnTopHint)
+        self.resize(640, 520)
+
+        layout = QVBoxLayout()
+        self.enable_chk = QCheckBox("Record timings and counters")
+        self.enable_chk.setChecked(instruments.enabled)
+        self.enable_chk.toggled.connect(self.on_toggled)
+        layout.addWidget(self.enable_chk)
+
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        layout.addWidget(self.text)
+
+        buttons = QHBoxLayout()
+        reset_btn = QPushButton("Reset")
+        reset_btn.clicked.connect(self.on_reset)
+        buttons.addWidget(reset_btn)
+        save_btn = QPushButton("Save JSON...")
+        save_btn.clicked.connect(self.on_save)
+        buttons.addWidget(save_btn)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(1000)
+        self.refresh()
+
+    def refresh(self):
+        self.text.setPlainText(self.instruments.format())
+
+    def on_toggled(self, checked):
+        self.instruments.set_enabled(checked)
+        self.refresh()
+
+    def on_reset(self):
+        self.instruments.reset()
+        self.refresh()
+
+    def on_save(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Stats", STATS_FILE, "JSON (*.json)")
+        if path:
+            try:
+                self.instruments.dump(path)
+            except OSError as e:
+                print(f"Failed to save stats: {e}")
+
 def main():
     app = QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(False)
@@ -180,35 +274,55 @@ def main():
     
     mascots = []
     config = load_config()
+    # One timer drives every mascot (instead of one QTimer each)
+    # Idle mascots are stepped less often (and woken as soon as something happens).
+    # Physics runs at a fixed physics_hz whatever the framerate; positions are interpolated in between
+    scheduler = MascotScheduler(config["fps"], app, config["adaptive_rate"], config["physics_hz"])
+    # Decoded sprites are shared by all mascots and bounded by this budget
+    shared_cache().set_budget(config["sprite_cache_mb"] * 1024 * 1024)
+    # All sounds play through one engine with a global voice cap and central volume
+    audio = shared_engine()
+    audio.set_max_voices(config["audio_voices"])
+    audio.set_volume(config["volume"] / 100.0)
+
+    # Hot-path timings and counters; switched on from the Stats panel (or the config)
+    instruments = shared_instruments()
+    instruments.add_source("sprite_cache", lambda: shared_cache().stats())
+    instruments.add_source("window_tracker", lambda: WindowManager.get_tracker().stats())
+    instruments.add_source("render", lambda: {
+        key: sum(m.sim.render_stats[key] for m in mascots)
+        for key in ('moves', 'moves_skipped', 'repaints', 'repaints_skipped')})
+    instruments.set_enabled(config["instrumentation"])
 
     def update_mascots():
         print("Updating settings...")
-        interval = int(1000 / config["fps"])
-        # Update time_scale and volume
-        time_scale = 30.0 / config["fps"]
+        # Render and physics rates are independent: one sets the timer interval, the other the step size
+        scheduler.set_fps(config["fps"])
+        if config["physics_hz"] != scheduler.physics_hz:
+            scheduler.set_physics_hz(config["physics_hz"])
+        
+        audio.set_volume(config["volume"] / 100.0)
+        if not config["sound"]:
+            audio.stop_all()
         
         for m in mascots:
-            m.tick_timer.setInterval(interval)
-            m.fps = config["fps"]
-            m.time_scale = time_scale
-            m.config = config
-            m.update_volume()
+            m.sim.config = config
 
     def open_settings():
         dlg = SettingsDialog(config, update_mascots)
         dlg.exec()
 
+    def open_stats():
+        dlg = StatsDialog(instruments)
+        dlg.exec()
+
     def pause_all():
-        for m in mascots:
-            if m.tick_timer.isActive():
-                m.tick_timer.stop()
-            else:
-                m.tick_timer.start()
+        scheduler.toggle()
 
     def reset_all():
         print("Resetting mascot positions...")
         for m in mascots:
-            m.teleport_to_random_pos()
+            m.sim.teleport_to_random_pos()
 
     # Menu
     menu = QMenu()
@@ -221,10 +335,17 @@ def main():
     settings_action.triggered.connect(open_settings)
     menu.addAction(settings_action)
 
+    stats_action = QAction("Stats", app)
+    stats_action.triggered.connect(open_stats)
+    menu.addAction(stats_action)
+
     pause_action = QAction("Pause/Resume", app)
     pause_action.triggered.connect(pause_all)
     menu.addAction(pause_action)
 
+    app.aboutToQuit.connect(WindowManager.shutdown)
+    app.aboutToQuit.connect(audio.stop_all)
+
     exit_action = QAction("Exit", app)
     exit_action.triggered.connect(app.quit)
     menu.addAction(exit_action)
@@ -232,6 +353,29 @@ def main():
     tray.setContextMenu(menu)
     tray.show()
 
+    # Overlay mode draws every mascot into one click-through window per monitor
+    overlay = OverlayManager(app) if config["render_mode"] == "overlay" else None
+    if overlay is not None:
+        app.aboutToQuit.connect(overlay.close)
+
+    # Monitor layout is cached; rebuild it only when the screen setup changes
+    def on_screens_changed():
+        WindowManager.invalidate_topology()
+        if overlay is not None:
+            overlay.rebuild()
+
+    def watch_screen(screen):
+        screen.geometryChanged.connect(lambda _: on_screens_changed())
+
+    def on_screen_added(screen):
+        watch_screen(screen)
+        on_screens_changed()
+
+    for screen in app.screens():
+        watch_screen(screen)
+    app.screenAdded.connect(on_screen_added)
+    app.screenRemoved.connect(lambda _: on_screens_changed())
+
     # Load Mascots
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     zip_files = glob.glob(os.path.join(base_dir, "*.zip"))
@@ -240,13 +384,42 @@ def main():
         print(f"No zip files found in {base_dir}")
         return
 
-    for zip_path in zip_files:
+    # Packs load on worker threads; mascots appear as each pack finishes.
+    # Every instance of a zip shares one loaded MascotPack
+    instances = max(1, int(config["instances_per_pack"]))
+
+    def on_pack_loaded(zip_path, compiled):
+        try:
+            pack = MascotPack.acquire(zip_path, compiled)
+        except Exception as e:
+            print(f"Failed to load {zip_path}: {e}")
+            return
+        if config["debug_action_table"]:
+            print(pack.dump_action_table())
         try:
-            mascot = Mascot(zip_path, config)
-            mascot.show()
-            mascots.append(mascot)
+            for _ in range(instances):
+                if overlay is not None:
+                    mascot = overlay.add_mascot(zip_path, config)
+                else:
+                    mascot = Mascot(zip_path, config)
+                    mascot.show()
+                scheduler.register(mascot.sim)
+                mascots.append(mascot)
         except Exception as e:
             print(f"Failed to load {zip_path}: {e}")
+        finally:
+            pack.release() # Mascots hold their own references
+
+    def on_pack_failed(zip_path, message):
+        print(f"Failed to load {zip_path}: {message}")
+
+    loader = PackLoader(app)
+    loader.loaded.connect(on_pack_loaded)
+    loader.failed.connect(on_pack_failed)
+    app.aboutToQuit.connect(loader.shutdown)
+    loader.load(zip_files)
+
+    scheduler.start()
 
     sys.exit(app.exec())
 
@@ -0,0 +1,67 @@
+# Grid cell size in pixels, about one mascot across
+CELL_SIZE = 128
+
+
+class MascotGrid:
+    """Uniform-grid spatial hash of mascot foot positions, for finding nearby
+    mascots without comparing every pair.
+
+    Rebuilt once per frame (see rebuild_grids); a query returns the mascots in the
+    cells the rect overlaps, as of the last rebuild. That is a superset of the
+    mascots inside the rect, so callers check the live positions themselves.
+    """
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = {} # (cell x, cell y) -> [mascot, ...]
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def rebuild(self, mascots):
+        size = self.cell_size
+        cells = {}
+        for m in mascots:
+            key = (int((m._x_float + m.current_anchor_x) // size), int((m._y_float + m.current_anchor_y) // size))
+            cell = cells.get(key)
+            if cell is None:
+                cells[key] = [m]
+            else:
+                cell.append(m)
+        self._cells = cells
+        self._count = len(mascots)
+
+    def clear(self):
+        self._cells = {}
+        self._count = 0
+
+    def query(self, left, top, right, bottom):
+        """Mascots whose foot was in a cell overlapping the rect at the last rebuild."""
+        size = self.cell_size
+        cells = self._cells
+        if not cells:
+            return []
+        found = []
+        y0, y1 = int(top // size), int(bottom // size)
+        for cx in range(int(left // size), int(right // size) + 1):
+            for cy in range(y0, y1 + 1):
+                cell = cells.get((cx, cy))
+                if cell:
+                    found.extend(cell)
+        return found
+
+
+def rebuild_grids(mascots):
+    """Rebuilds the mascot grid of every desktop the mascots are on, and returns
+    those desktops."""
+    by_desktop = {}
+    for m in mascots:
+        group = by_desktop.get(m.desktop)
+        if group is None:
+            by_desktop[m.desktop] = [m]
+        else:
+            group.append(m)
+    for desktop, group in by_desktop.items():
+        desktop.mascot_grid.rebuild(group)
+    return list(by_desktop)
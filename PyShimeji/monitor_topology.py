@@ -0,0 +1,120 @@
+from bisect import bisect_right
+
+# Used when no monitor could be enumerated
+DEFAULT_SCREEN = (0, 0, 1920, 1080)
+FLOOR_OFFSET = 50
+
+
+class MonitorTopology:
+    """Immutable snapshot of the monitor layout with precomputed x-interval lookups.
+
+    `screens` is a list of (left, top, right, bottom) rects. The x axis is split at
+    every monitor edge into elementary segments; each segment (and each edge point,
+    since monitor ranges are inclusive) knows which monitors cover it, so screen,
+    floor and gap queries are a bisect plus a scan over the few overlapping monitors.
+    """
+
+    def __init__(self, screens):
+        self.screens = [tuple(s) for s in screens]
+        if self.screens:
+            self.min_x = min(s[0] for s in self.screens)
+            self.max_x = max(s[2] for s in self.screens)
+        else:
+            self.min_x, self.max_x = DEFAULT_SCREEN[0], DEFAULT_SCREEN[2]
+        self._build()
+
+    def _build(self):
+        screens = self.screens
+        self._bounds = sorted({s[0] for s in screens} | {s[2] for s in screens})
+        bounds = self._bounds
+
+        def covering(lo, hi):
+            # Monitors (in enumeration order) whose x-range contains [lo, hi]
+            return tuple(s for s in screens if s[0] <= lo and hi <= s[2])
+
+        # _point[i]: monitors containing x == bounds[i]
+        # _span[i]: monitors containing bounds[i] < x < bounds[i+1]
+        self._point = [covering(b, b) for b in bounds]
+        self._span = [covering(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+        # Same lists ordered top to bottom, for floor lookups
+        self._point_by_top = [tuple(sorted(c, key=lambda s: s[1])) for c in self._point]
+        self._span_by_top = [tuple(sorted(c, key=lambda s: s[1])) for c in self._span]
+
+        # Merged x-ranges of the whole desktop, for gap tests
+        merged = []
+        for l, _, r, _ in sorted(screens):
+            if merged and l <= merged[-1][1]:
+                if r > merged[-1][1]:
+                    merged[-1][1] = r
+            else:
+                merged.append([l, r])
+        self._merged_starts = [m[0] for m in merged]
+        self._merged_ends = [m[1] for m in merged]
+
+    def __eq__(self, other):
+        return isinstance(other, MonitorTopology) and self.screens == other.screens
+
+    def __repr__(self):
+        return f"MonitorTopology({self.screens!r})"
+
+    def _covering(self, x, by_top=False):
+        bounds = self._bounds
+        i = bisect_right(bounds, x) - 1
+        if i < 0:
+            return ()
+        if bounds[i] == x:
+            return self._point_by_top[i] if by_top else self._point[i]
+        if i >= len(self._span):
+            return ()
+        return self._span_by_top[i] if by_top else self._span[i]
+
+    def _closest_horizontally(self, x):
+        # Same result as min(screens, key=horizontal distance): first monitor wins ties
+        best = None
+        best_dist = None
+        for s in self.screens:
+            if s[0] <= x <= s[2]:
+                return s
+            d = min(abs(s[0] - x), abs(s[2] - x))
+            if best_dist is None or d < best_dist:
+                best, best_dist = s, d
+        return best
+
+    def screen_at(self, x, y):
+        if not self.screens: return DEFAULT_SCREEN
+        candidates = self._covering(x)
+        for s in candidates:
+            # Lenient vertical check (100px buffer) to handle staggered monitors
+            if s[1] - 100 <= y <= s[3] + 100:
+                return s
+        # Not inside any: the first monitor sharing this X, or the closest one
+        if candidates:
+            return candidates[0]
+        return self._closest_horizontally(x)
+
+    def floor_at(self, x, y):
+        if not self.screens: return DEFAULT_SCREEN[3] - FLOOR_OFFSET
+        candidates = self._covering(x, by_top=True)
+        if not candidates:
+            # In a gap? Use the closest screen horizontally
+            return self._closest_horizontally(x)[3] - FLOOR_OFFSET
+
+        # First monitor (top to bottom) that contains Y or lies below it
+        for s in candidates:
+            if y <= s[3]:
+                return s[3] - FLOOR_OFFSET
+        # Below all screens: bottom-most floor
+        return candidates[-1][3] - FLOOR_OFFSET
+
+    def is_x_in_any_monitor(self, x, buffer=5):
+        i = bisect_right(self._merged_starts, x + buffer) - 1
+        return i >= 0 and self._merged_ends[i] >= x - buffer
+
+
+class FakeMonitorTopology(MonitorTopology):
+    """Topology with a fixed layout, for running the physics without real monitors."""
+
+    DUAL_1080P = [(0, 0, 1920, 1080), (1920, 0, 3840, 1080)]
+
+    def __init__(self, screens=None):
+        super().__init__(self.DUAL_1080P if screens is None else screens)
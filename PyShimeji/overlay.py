@@ -0,0 +1,233 @@
+from PyQt6.QtWidgets import QWidget
+from PyQt6.QtCore import QObject, Qt, QRect, QTimer
+from PyQt6.QtGui import QCursor, QPainter, QGuiApplication
+from window_manager import WindowManager
+from pack import MascotPack, resource_name
+from simulation import MascotSim
+from instruments import shared_instruments
+
+_instruments = shared_instruments()
+
+# How often the cursor is hit-tested to decide whether the overlays take mouse input
+HIT_TEST_INTERVAL_MS = 30
+
+
+class OverlayView:
+    """A mascot drawn by the overlays instead of its own window: the MascotSim's
+    view in overlay mode. Keeps the current sprite and screen rect; changes only
+    invalidate the area that needs repainting."""
+
+    def __init__(self, manager, zip_path, config=None, seed=None):
+        self.manager = manager
+        self.zip_path = zip_path
+        self.pack = MascotPack.acquire(zip_path)
+        self.pixmap = None
+        self.mask = None
+        self._shown_variant = None
+        self.sim = MascotSim(self.pack, WindowManager.desktop(), config, seed, view=self)
+        self.rect = QRect(self.sim.pos[0], self.sim.pos[1], 0, 0)
+
+    # --- View interface used by the simulation ---
+
+    def cursor_pos(self):
+        if _instruments.enabled:
+            _instruments.count("QCursor.pos")
+        pos = QCursor.pos()
+        return pos.x(), pos.y()
+
+    def window_id(self):
+        return 0 # Overlays belong to this process and are never in the window cache
+
+    def move(self, x, y):
+        old = QRect(self.rect)
+        self.rect.moveTo(x, y)
+        self.manager.invalidate(old)
+        self.manager.invalidate(self.rect)
+
+    def show_frame(self, frame, entered):
+        """Shows an animation frame; `entered` is True on the frame's first tick."""
+        sim = self.sim
+        if sim.config.get("sound", True) and frame.get('sound') and entered:
+            self.pack.play_sound(resource_name(frame['sound']))
+
+        sprite = self.pack.get_sprite(frame['image_key'])
+        if sprite:
+            variant = sprite[sim.facing_right]
+            if variant is not self._shown_variant:
+                old = QRect(self.rect)
+                self.pixmap, self.mask = variant
+                self._shown_variant = variant
+                self.rect.setSize(self.pixmap.size())
+                self.manager.invalidate(old)
+                self.manager.invalidate(self.rect)
+                sim.render_stats['repaints'] += 1
+            else:
+                sim.render_stats['repaints_skipped'] += 1
+
+    # --- Overlay side ---
+
+    def contains(self, point):
+        """Software hit test against the sprite's mask (global coordinates)."""
+        if self.mask is None or not self.rect.contains(point):
+            return False
+        return self.mask.contains(point - self.rect.topLeft())
+
+    def close(self):
+        self.manager.remove(self)
+
+
+class OverlayWindow(QWidget):
+    """Transparent always-on-top window covering one monitor. Click-through except
+    while the cursor is over a mascot."""
+
+    def __init__(self, manager, geometry):
+        super().__init__()
+        self.manager = manager
+        self.click_through = None
+        self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint | Qt.WindowType.Tool)
+        self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
+        self.setAttribute(Qt.WidgetAttribute.WA_NoSystemBackground)
+        self.setAttribute(Qt.WidgetAttribute.WA_ShowWithoutActivating)
+        self.setGeometry(geometry)
+
+    def set_click_through(self, enabled):
+        if enabled != self.click_through:
+            self.click_through = enabled
+            WindowManager.set_click_through(int(self.winId()), enabled)
+
+    def paintEvent(self, event):
+        # Every mascot overlapping the dirty area, in stacking order, in one pass
+        painter = QPainter(self)
+        origin = self.geometry().topLeft()
+        area = event.rect().translated(origin)
+        for view in self.manager.views:
+            if view.pixmap is not None and view.rect.intersects(area):
+                painter.drawPixmap(view.rect.topLeft() - origin, view.pixmap)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            pos = event.globalPosition().toPoint()
+            view = self.manager.hit_test(pos)
+            if view is not None:
+                self.manager.start_drag(view, pos)
+
+    def mouseMoveEvent(self, event):
+        self.manager.drag_to(event.globalPosition().toPoint())
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self.manager.end_drag()
+
+
+class OverlayManager(QObject):
+    """Draws every mascot into one transparent overlay per monitor.
+
+    The window system sees a fixed number of windows however many mascots there
+    are, and no per-frame setMask: the overlays stay click-through, and a timer
+    hit-tests the cursor against the cached sprite masks to let clicks on a
+    mascot reach them. Dragging works as with Mascot widgets.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.views = [] # Stacking order, last on top
+        self.overlays = []
+        self.dragged = None
+        self.drag_offset = None
+        self.last_pos = None
+        self.velocity_history = []
+        self.rebuild()
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_input)
+        self.timer.start(HIT_TEST_INTERVAL_MS)
+
+    def rebuild(self):
+        """(Re)creates the overlays to match the current monitors."""
+        for overlay in self.overlays:
+            overlay.close()
+            overlay.deleteLater()
+        self.overlays = [OverlayWindow(self, screen.geometry()) for screen in QGuiApplication.screens()]
+        for overlay in self.overlays:
+            overlay.show()
+            overlay.set_click_through(True)
+
+    def add_mascot(self, zip_path, config=None, seed=None):
+        view = OverlayView(self, zip_path, config, seed)
+        self.views.append(view)
+        return view
+
+    def remove(self, view):
+        if view not in self.views:
+            return
+        self.views.remove(view)
+        self.invalidate(view.rect)
+        if view is self.dragged:
+            self.dragged = None
+        if view.sim.scheduler is not None:
+            view.sim.scheduler.unregister(view.sim)
+        view.pack.release()
+
+    def invalidate(self, rect):
+        if rect.isEmpty():
+            return
+        for overlay in self.overlays:
+            geometry = overlay.geometry()
+            if geometry.intersects(rect):
+                overlay.update(rect.translated(-geometry.topLeft()))
+
+    def hit_test(self, pos):
+        """Topmost mascot with an opaque pixel at `pos` (global coordinates)."""
+        for view in reversed(self.views):
+            if view.contains(pos):
+                return view
+        return None
+
+    def update_input(self):
+        # Take mouse input only while it would land on a mascot (or a drag is on)
+        takes_input = self.dragged is not None or self.hit_test(QCursor.pos()) is not None
+        for overlay in self.overlays:
+            overlay.set_click_through(not takes_input)
+
+    # --- Dragging (same feel as Mascot's mouse handlers) ---
+
+    def start_drag(self, view, pos):
+        self.dragged = view
+        self.drag_offset = pos - view.rect.topLeft()
+        self.last_pos = pos
+        self.velocity_history = []
+        view.sim.grab()
+        QGuiApplication.setOverrideCursor(QCursor(Qt.CursorShape.ClosedHandCursor))
+
+    def drag_to(self, pos):
+        view = self.dragged
+        if view is None or not view.sim.dragging:
+            return
+        top_left = pos - self.drag_offset
+        view.sim.set_position(top_left.x(), top_left.y())
+        view.move(top_left.x(), top_left.y())
+        self.velocity_history.append(pos - self.last_pos)
+        if len(self.velocity_history) > 5:
+            self.velocity_history.pop(0)
+        self.last_pos = pos
+
+    def end_drag(self):
+        view = self.dragged
+        if view is None:
+            return
+        self.dragged = None
+        QGuiApplication.restoreOverrideCursor()
+        velocity = None
+        if self.velocity_history:
+            avg_x = sum(p.x() for p in self.velocity_history) / len(self.velocity_history)
+            avg_y = sum(p.y() for p in self.velocity_history) / len(self.velocity_history)
+            velocity = (avg_x, avg_y)
+        view.sim.release(velocity)
+
+    def close(self):
+        self.timer.stop()
+        for view in list(self.views):
+            self.remove(view)
+        for overlay in self.overlays:
+            overlay.close()
+        self.overlays = []
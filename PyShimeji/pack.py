@@ -0,0 +1,89 @@
+import os
+import time
+from PyQt6.QtGui import QPixmap, QTransform, QRegion
+from sprite_cache import shared_cache
+from pack_cache import load_or_build, resource_name
+from pack_data import PackData
+
+def build_sprite(pix):
+    """Both orientations of a pose and their masks, computed once per decode.
+    Index with facing_right: sprite[False] is the original, sprite[True] mirrored."""
+    mirrored = pix.transformed(QTransform().scale(-1, 1))
+    return ((pix, QRegion(pix.mask())), (mirrored, QRegion(mirrored.mask())))
+
+class MascotPack(PackData):
+    """Everything loaded from one mascot zip: actions, behaviors, sprites and sounds.
+
+    A pack is loaded once per zip and shared by every Mascot using it. Use
+    acquire()/release() rather than the constructor; the pack is unloaded when the
+    last mascot releases it. Treat its contents as read-only.
+    """
+
+    _loaded = {} # Map absolute zip path -> MascotPack
+
+    def __init__(self, zip_path, compiled=None):
+        self.zip_path = zip_path
+        self.name = os.path.splitext(os.path.basename(zip_path))[0]
+        self.ref_count = 0
+
+        # Parsed tables and sprite atlas come from the on-disk compiled cache
+        # (already loaded by a PackLoader worker if `compiled` is given)
+        start = time.perf_counter()
+        if compiled is None:
+            compiled, _ = load_or_build(zip_path)
+        PackData.__init__(self, compiled, self.name)
+        self.cache_built = compiled.built
+        self.pack_hash = compiled.pack_hash # Identifies this pack in the sprite cache
+
+        # Sounds are already decoded in memory; the shared engine plays them. It is
+        # only loaded (with QtMultimedia) when the pack first plays a sound.
+        self._sounds_registered = False
+
+        self.gui_seconds = time.perf_counter() - start
+        print(f"Loaded {self.name} in {compiled.load_seconds * 1000:.0f} ms "
+              f"({'cold, cache built' if self.cache_built else 'warm, from cache'}), "
+              f"{self.gui_seconds * 1000:.0f} ms on the GUI thread")
+
+    @classmethod
+    def acquire(cls, zip_path, compiled=None):
+        """Returns the shared pack for a zip, loading it on first use."""
+        key = os.path.abspath(zip_path)
+        pack = cls._loaded.get(key)
+        if pack is None:
+            pack = cls(zip_path, compiled)
+            cls._loaded[key] = pack
+        elif compiled is not None and compiled is not pack.compiled:
+            compiled.close() # Loaded twice; keep the pack already in use
+        pack.ref_count += 1
+        return pack
+
+    def release(self):
+        self.ref_count -= 1
+        if self.ref_count > 0:
+            return
+        MascotPack._loaded.pop(os.path.abspath(self.zip_path), None)
+        shared_cache().discard_pack(self.pack_hash)
+        if self._sounds_registered:
+            from audio import shared_engine
+            shared_engine().unregister_pack(self.pack_hash)
+        self.compiled.close()
+
+    def play_sound(self, name):
+        from audio import shared_engine # Needs QtMultimedia
+        engine = shared_engine()
+        if not self._sounds_registered:
+            engine.register_pack(self.pack_hash, self.compiled.sounds)
+            self._sounds_registered = True
+        return engine.play(self.pack_hash, name)
+
+    def get_sprite(self, image_key):
+        """Decoded sprite for an image name, or None if the pack doesn't contain it."""
+        if image_key not in self.compiled.frames:
+            return None
+
+        def decode():
+            pix = QPixmap.fromImage(self.compiled.image(image_key))
+            # Two 32-bit pixmaps (original + mirrored)
+            return build_sprite(pix), pix.width() * pix.height() * 4 * 2
+
+        return shared_cache().get((self.pack_hash, image_key), decode)
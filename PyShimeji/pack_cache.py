@@ -0,0 +1,390 @@
+import os
+import io
+import json
+import mmap
+import time
+import wave
+import shutil
+import zipfile
+import hashlib
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+from PyQt6.QtGui import QImage, QPainter
+
+# Bump whenever the compiled layout or the action tables change shape
+CACHE_VERSION = 5
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+ATLAS_FORMAT = QImage.Format.Format_ARGB32_Premultiplied
+
+def resource_name(path):
+    """Flattens an image/sound path ("/shime1.png", "img\\shime1.png") to its file name."""
+    return path.replace('\\', '/').rsplit('/', 1)[-1]
+
+def find_entry(z, suffix):
+    """Name of the zip entry ending with suffix (zips may use / or \\ separators)."""
+    for n in z.namelist():
+        if n.replace('\\', '/').endswith(suffix):
+            return n
+    return None
+
+# Action attributes that aren't parameters
+ACTION_ATTRIBUTES = ('Name', 'Type', 'BorderType', 'Class', 'Loop', 'Condition')
+
+def _action_node(action, ns):
+    """Composition fields of an <Action>: its parameters and its child actions and
+    ActionReferences (nested anonymous actions become nested nodes)."""
+    children = []
+    for child in action:
+        if child.tag == ns + 'ActionReference':
+            children.append({
+                'ref': child.get('Name'),
+                'condition': child.get('Condition'),
+                'params': {k: v for k, v in child.attrib.items() if k not in ('Name', 'Condition')},
+            })
+        elif child.tag == ns + 'Action':
+            node = _action_node(child, ns)
+            node['type'] = child.get('Type')
+            children.append(node)
+    return {
+        'class': action.get('Class'),
+        'loop': action.get('Loop', 'false').lower() == 'true',
+        'condition': action.get('Condition'),
+        'params': {k: v for k, v in action.attrib.items() if k not in ACTION_ATTRIBUTES},
+        'children': children,
+    }
+
+def parse_actions(z):
+    """Action tables from conf/actions.xml: name -> {'type', 'frames', 'animations',
+    'children', ...}. `frames` is the first animation, used when an action has no conditions."""
+    actions = {}
+    try:
+        conf_path = find_entry(z, 'actions.xml')
+        with z.open(conf_path) as f:
+            tree = ET.parse(f)
+            root = tree.getroot()
+            ns = {'ns': 'http://www.group-finity.com/Mascot'}
+
+            for action in root.findall('.//ns:Action', ns):
+                name = action.get('Name')
+                type_ = action.get('Type')
+
+                # Every <Animation>; Shimeji plays the first whose Condition holds
+                animations = []
+                for anim_node in action.findall('ns:Animation', ns):
+                    frames = []
+                    for pose in anim_node.findall('ns:Pose', ns):
+                        img_path = pose.get('Image')
+                        duration = int(pose.get('Duration', 5))
+                        velocity = pose.get('Velocity', '0,0')
+                        vx, vy = map(float, velocity.split(','))
+                        anchor = pose.get('ImageAnchor', '0,0')
+                        ax, ay = map(int, anchor.split(','))
+                        sound_file = pose.get('Sound', '')
+
+                        frames.append({
+                            'image': img_path,
+                            'image_key': resource_name(img_path or ''),
+                            'duration': duration,
+                            'vx': vx,
+                            'vy': vy,
+                            'ax': ax,
+                            'ay': ay,
+                            'sound': sound_file
+                        })
+                    animations.append({'condition': anim_node.get('Condition'), 'frames': frames})
+
+                if name:
+                    actions[name] = {
+                        'type': type_,
+                        'border': action.get('BorderType'),
+                        'frames': animations[0]['frames'] if animations else [],
+                        'animations': animations,
+                    }
+                    # Sequence/Select structure, compiled into programs by action_program
+                    actions[name].update(_action_node(action, '{%s}' % ns['ns']))
+    except Exception as e:
+        print(f"Error parsing actions.xml: {e}")
+    return actions
+
+def parse_behaviors(z):
+    """Behavior list from conf/behaviors.xml, flattened: each behavior carries the
+    conditions of the <Condition> blocks enclosing it."""
+    behaviors = []
+    conf_path = find_entry(z, 'behaviors.xml')
+    if conf_path is None:
+        return behaviors
+    try:
+        with z.open(conf_path) as f:
+            root = ET.parse(f).getroot()
+    except Exception as e:
+        print(f"Error parsing behaviors.xml: {e}")
+        return behaviors
+    ns = '{http://www.group-finity.com/Mascot}'
+
+    def walk(node, conditions):
+        for child in node:
+            if child.tag == ns + 'Condition':
+                walk(child, conditions + [child.get('Condition', '')])
+            elif child.tag == ns + 'BehaviorList':
+                walk(child, conditions)
+            elif child.tag == ns + 'Behavior':
+                own = [child.get('Condition')] if child.get('Condition') else []
+                next_node = child.find(ns + 'NextBehavior')
+                next_behaviors = None
+                if next_node is not None:
+                    next_behaviors = {
+                        'add': next_node.get('Add', 'true').lower() == 'true',
+                        'refs': [{
+                            'name': ref.get('Name'),
+                            'frequency': float(ref.get('Frequency', 0)),
+                            'condition': ref.get('Condition'),
+                        } for ref in next_node.iter(ns + 'BehaviorReference')],
+                    }
+                behaviors.append({
+                    'name': child.get('Name'),
+                    'frequency': float(child.get('Frequency', 0)),
+                    'conditions': conditions + own,
+                    'next': next_behaviors,
+                })
+
+    walk(root, [])
+    return behaviors
+
+def hash_file(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    return hashlib.sha1(data).hexdigest(), data
+
+class CompiledPack:
+    """A pack compiled to disk: pre-parsed action tables, one memory-mapped sprite atlas
+    and the sounds decoded to raw PCM.
+
+    The atlas is a single uncompressed image with every pose stacked vertically;
+    `frames` maps image name -> (x, y, w, h) rect. Reading a sprite is a slice of the
+    mapped file, with no zip access and no PNG decoding. `sounds` maps sound name ->
+    (format, pcm bytes), read into memory when the pack is opened.
+    """
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.pack_hash = meta['hash']
+        self.actions = meta['actions']
+        self.behaviors = meta['behaviors']
+        self.frames = {name: tuple(rect) for name, rect in meta['frames'].items()}
+        self.anchors = {name: tuple(a) for name, a in meta['anchors'].items()}
+        self.atlas_width = meta['atlas_width']
+        self.atlas_height = meta['atlas_height']
+        self.stride = meta['stride']
+        self.sounds = {}
+        for name, fmt in meta['sounds'].items():
+            with open(os.path.join(path, 'sounds', name + '.pcm'), 'rb') as f:
+                self.sounds[name] = (fmt, f.read())
+
+        self._atlas_file = open(os.path.join(path, 'atlas.raw'), 'rb')
+        try:
+            size = os.fstat(self._atlas_file.fileno()).st_size
+            if size != self.stride * self.atlas_height:
+                raise ValueError("atlas size mismatch")
+            self._atlas = mmap.mmap(self._atlas_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        except:
+            self._atlas_file.close()
+            raise
+
+    def image(self, name):
+        """The pose image as a QImage, or None if the pack has no such image."""
+        rect = self.frames.get(name)
+        if rect is None:
+            return None
+        x, y, w, h = rect
+        start = y * self.stride + x * 4
+        data = self._atlas[start:(y + h) * self.stride]
+        return QImage(data, w, h, self.stride, ATLAS_FORMAT).copy()
+
+    def close(self):
+        if isinstance(self._atlas, mmap.mmap):
+            self._atlas.close()
+        self._atlas_file.close()
+
+def _anchors_by_image(actions):
+    # First anchor each image is used with, kept alongside its atlas rect
+    anchors = {}
+    for action in actions.values():
+        for frame in (f for anim in action['animations'] for f in anim['frames']):
+            anchors.setdefault(frame['image_key'], (frame['ax'], frame['ay']))
+    return anchors
+
+def build(zip_bytes, pack_hash, entry_dir, source_name=""):
+    """Compiles a zip into entry_dir (written to a temp dir, then renamed into place).
+
+    Each build gets its own temp dir, so loaders building the same pack at once
+    (two copies of one zip) don't remove each other's files; the first to finish
+    wins and the others discard theirs."""
+    tmp_dir = tempfile.mkdtemp(prefix=os.path.basename(entry_dir) + ".", suffix=".tmp",
+                               dir=os.path.dirname(entry_dir))
+    os.makedirs(os.path.join(tmp_dir, 'sounds'))
+
+    images = []
+    sounds = {} # Map name -> PCM format (channels, rate, sample width)
+    with zipfile.ZipFile(io.BytesIO(zip_bytes), 'r') as z:
+        actions = parse_actions(z)
+        behaviors = parse_behaviors(z)
+        for file_info in z.infolist():
+            lower = file_info.filename.lower()
+            if lower.endswith('.png'):
+                image = QImage.fromData(z.read(file_info))
+                if not image.isNull():
+                    images.append((resource_name(file_info.filename), image.convertToFormat(ATLAS_FORMAT)))
+            elif lower.endswith('.wav'):
+                name = resource_name(file_info.filename)
+                try:
+                    with wave.open(io.BytesIO(z.read(file_info))) as w:
+                        fmt = {'channels': w.getnchannels(), 'rate': w.getframerate(), 'width': w.getsampwidth()}
+                        pcm = w.readframes(w.getnframes())
+                except (wave.Error, EOFError) as e:
+                    print(f"Skipping sound {name}: {e}")
+                    continue
+                with open(os.path.join(tmp_dir, 'sounds', name + '.pcm'), 'wb') as f:
+                    f.write(pcm)
+                sounds[name] = fmt
+
+    # Vertical strip atlas: every pose gets its own rows
+    width = max((img.width() for _, img in images), default=0)
+    height = sum(img.height() for _, img in images)
+    frames = {}
+    stride = width * 4
+    atlas_bytes = b''
+    if width and height:
+        atlas = QImage(width, height, ATLAS_FORMAT)
+        atlas.fill(0)
+        painter = QPainter(atlas)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+        y = 0
+        for name, img in images:
+            painter.drawImage(0, y, img)
+            frames[name] = (0, y, img.width(), img.height())
+            y += img.height()
+        painter.end()
+        stride = atlas.bytesPerLine()
+        bits = atlas.constBits()
+        bits.setsize(atlas.sizeInBytes())
+        atlas_bytes = bytes(bits)
+
+    with open(os.path.join(tmp_dir, 'atlas.raw'), 'wb') as f:
+        f.write(atlas_bytes)
+
+    meta = {
+        'version': CACHE_VERSION,
+        'hash': pack_hash,
+        'source': source_name,
+        'actions': actions,
+        'behaviors': behaviors,
+        'frames': frames,
+        'anchors': _anchors_by_image(actions),
+        'atlas_width': width,
+        'atlas_height': height,
+        'stride': stride,
+        'sounds': sounds,
+    }
+    with open(os.path.join(tmp_dir, 'pack.json'), 'w') as f:
+        json.dump(meta, f)
+
+    try:
+        os.replace(tmp_dir, entry_dir)
+    except OSError:
+        # entry_dir exists: built by another loader just now (keep it) or stale (replace it)
+        try:
+            _read(entry_dir, pack_hash)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        except (OSError, ValueError, KeyError):
+            pass
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+
+def _read(entry_dir, pack_hash):
+    with open(os.path.join(entry_dir, 'pack.json'), 'r') as f:
+        meta = json.load(f)
+    if meta.get('version') != CACHE_VERSION or meta.get('hash') != pack_hash:
+        raise ValueError("stale cache entry")
+    return CompiledPack(entry_dir, meta)
+
+def _prune(cache_dir, source_name, keep):
+    # Drop entries compiled from older versions of the same zip
+    try:
+        entries = os.listdir(cache_dir)
+    except OSError:
+        return
+    for entry in entries:
+        path = os.path.join(cache_dir, entry)
+        # Skip entries another loader thread is still writing
+        if entry == keep or entry.endswith('.tmp') or not os.path.isdir(path):
+            continue
+        try:
+            with open(os.path.join(path, 'pack.json'), 'r') as f:
+                if json.load(f).get('source') != source_name:
+                    continue
+        except (OSError, ValueError):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+
+def _stamp_path(cache_dir, zip_path):
+    key = hashlib.sha1(os.path.abspath(zip_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, key + ".stamp")
+
+def _stamped_hash(cache_dir, zip_path, stamp):
+    """Content hash recorded for the zip when it had this (size, mtime), or None."""
+    try:
+        with open(_stamp_path(cache_dir, zip_path), 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (data.get('size'), data.get('mtime_ns')) != stamp:
+        return None
+    return data.get('hash')
+
+def _write_stamp(cache_dir, zip_path, stamp, pack_hash):
+    path = _stamp_path(cache_dir, zip_path)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, 'w') as f:
+            json.dump({'size': stamp[0], 'mtime_ns': stamp[1], 'hash': pack_hash}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Could not write cache stamp for {zip_path}: {e}")
+
+def load_or_build(zip_path, cache_dir=CACHE_DIR):
+    """Returns (CompiledPack, built). Entries are keyed by the zip's content hash, so an
+    edited zip misses the cache; unreadable or outdated entries are rebuilt.
+
+    A warm start doesn't read the zip: a stamp file remembers the hash for the zip's
+    size and mtime, and the entry's own hash confirms it. The zip is only hashed
+    when the stamp is missing or out of date.
+
+    Only uses QImage/QPainter on images, so it is safe to call from a worker thread.
+    The returned pack records `built` and `load_seconds` for startup timing."""
+    start = time.perf_counter()
+    stat = os.stat(zip_path)
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    compiled = None
+    pack_hash = _stamped_hash(cache_dir, zip_path, stamp)
+    if pack_hash is not None:
+        try:
+            compiled, built = _read(os.path.join(cache_dir, pack_hash), pack_hash), False
+        except (OSError, ValueError, KeyError):
+            pass
+    if compiled is None:
+        pack_hash, zip_bytes = hash_file(zip_path)
+        entry_dir = os.path.join(cache_dir, pack_hash)
+        try:
+            compiled, built = _read(entry_dir, pack_hash), False
+        except (OSError, ValueError, KeyError):
+            source_name = os.path.basename(zip_path)
+            os.makedirs(cache_dir, exist_ok=True)
+            build(zip_bytes, pack_hash, entry_dir, source_name)
+            _prune(cache_dir, source_name, pack_hash)
+            compiled, built = _read(entry_dir, pack_hash), True
+        _write_stamp(cache_dir, zip_path, stamp, pack_hash)
+    compiled.built = built
+    compiled.load_seconds = time.perf_counter() - start
+    return compiled, built
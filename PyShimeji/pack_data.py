@@ -0,0 +1,90 @@
+from types import MappingProxyType
+from behaviors import BehaviorGraph
+from action_program import compile_programs
+from expressions import compile_condition
+
+# Action names the engine asks for, with the exact-name fallbacks tried before the
+# last entry goes through generic matching (substring, then Stand, then anything)
+REQUESTED_ACTIONS = {
+    "Stand": ("Stand",),
+    "Sit": ("Sit",),
+    "Walk": ("Walk",),
+    "Falling": ("Falling",),
+    "Pinched": ("Pinched",),
+    "GrabWall": ("GrabWall", "Pinched"),
+    "ClimbWall": ("ClimbWall", "GrabWall"),
+}
+
+class PackData:
+    """The parts of a compiled pack the simulation needs: actions, the action name
+    table, conditional animations, action programs and the behavior graph.
+
+    Needs no Qt; MascotPack adds sprites, sounds and sharing on top.
+    """
+
+    def __init__(self, compiled, name=None):
+        self.compiled = compiled
+        self.name = name or compiled.pack_hash[:12] # Zip file name, or the content hash headless
+        self.actions = MappingProxyType(compiled.actions)
+        self.action_table = self.build_action_table()
+        self.animations = self.build_animation_table()
+        self.programs = compile_programs(compiled.actions)
+        self.behavior_graph = BehaviorGraph(compiled.behaviors, self.programs)
+
+    def _match_action(self, name):
+        # Exact match
+        if name in self.actions:
+            return name
+        # Partial match (e.g. "Walk" finds "Walk1"), shortest first
+        candidates = [k for k in self.actions if name in k]
+        if candidates:
+            return min(candidates, key=len)
+        # Fallback to "Stand", then to anything at all
+        if "Stand" in self.actions:
+            return "Stand"
+        return next(iter(self.actions), None)
+
+    def _resolve_uncached(self, name):
+        chain = REQUESTED_ACTIONS.get(name, (name,))
+        for preferred in chain[:-1]:
+            if preferred in self.actions:
+                return preferred
+        return self._match_action(chain[-1])
+
+    def build_action_table(self):
+        """Maps every action name and every engine-requested name to the action it plays."""
+        table = {}
+        for name in list(self.actions) + list(REQUESTED_ACTIONS):
+            table[name] = self._resolve_uncached(name)
+        return table
+
+    def build_animation_table(self):
+        """Maps each action with conditional animations to ((condition, frames), ...),
+        conditions compiled once here (None for an unconditional animation)."""
+        table = {}
+        for name, action in self.actions.items():
+            animations = action['animations']
+            if not any(anim['condition'] for anim in animations):
+                continue
+            table[name] = tuple(
+                (compile_condition(anim['condition']) if anim['condition'] else None, anim['frames'])
+                for anim in animations)
+        return table
+
+    def resolve_action(self, name):
+        """Name of the action to play for a requested name (None only if the pack has no actions)."""
+        try:
+            return self.action_table[name]
+        except KeyError:
+            # Not requested at load time (e.g. behavior names); resolve once and remember
+            resolved = self.action_table[name] = self._resolve_uncached(name)
+            return resolved
+
+    def dump_action_table(self):
+        """Debug listing of how each requested name resolves."""
+        lines = [f"Action table for {self.name}:"]
+        for name in sorted(self.action_table):
+            resolved = self.action_table[name]
+            note = "" if resolved == name else "  (fallback)"
+            lines.append(f"  {name:<28} -> {resolved}{note}")
+        return "\n".join(lines)
@@ -0,0 +1,39 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtCore import QObject, pyqtSignal
+from pack_cache import load_or_build
+
+
+class PackLoader(QObject):
+    """Loads packs on a worker pool and hands each one back to the GUI thread as it finishes.
+
+    Workers do everything that doesn't need the GUI thread: reading and hashing
+    the zip, parsing the XML and decoding images into the compiled cache. Only
+    creating the MascotPack and the mascot widgets is left to the
+    `loaded` handler, which runs on the thread that owns this object.
+    """
+
+    loaded = pyqtSignal(str, object)  # zip path, CompiledPack
+    failed = pyqtSignal(str, str)     # zip path, error message
+
+    def __init__(self, parent=None, max_workers=None):
+        super().__init__(parent)
+        if max_workers is None:
+            max_workers = min(4, os.cpu_count() or 1)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pack-loader")
+
+    def load(self, zip_paths):
+        for zip_path in zip_paths:
+            self._pool.submit(self._load_one, zip_path)
+
+    def _load_one(self, zip_path):
+        # Runs on a worker; the signals are queued to the GUI thread
+        try:
+            compiled, _ = load_or_build(zip_path)
+        except Exception as e:
+            self.failed.emit(zip_path, str(e))
+            return
+        self.loaded.emit(zip_path, compiled)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,23 @@
+"""Inputs shared by the headless runner (sim.py) and benchmark.py."""
+import os
+import glob
+import random
+
+
+def synthetic_windows(count, seed=1, width=3840, height=1080):
+    """Random (hwnd, rect, title) entries shaped like WindowManager._window_cache."""
+    rng = random.Random(seed)
+    windows = []
+    for hwnd in range(1, count + 1):
+        w = rng.randint(200, 1400)
+        h = rng.randint(150, 900)
+        left = rng.randint(-100, width - 100)
+        top = rng.randint(0, height - 100)
+        windows.append((hwnd, (left, top, left + w, top + h), f"Window {hwnd}"))
+    return windows
+
+
+def bundled_zips():
+    """The mascot zips next to the PyShimeji folder."""
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return sorted(glob.glob(os.path.join(base_dir, "*.zip")))
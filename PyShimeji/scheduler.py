@@ -0,0 +1,242 @@
+from time import perf_counter
+from PyQt6.QtCore import QObject, QTimer, Qt
+from instruments import shared_instruments
+from mascot_grid import rebuild_grids
+
+_instruments = shared_instruments()
+
+# Slowest rate an idle mascot drops to, as a divider of the physics rate
+MAX_IDLE_DIVIDER = 8
+
+# Most physics steps run for one timer tick; past that the backlog is dropped
+# (the GUI thread was stalled) instead of trying to catch up with it
+MAX_CATCH_UP_STEPS = 5
+
+
+class MascotScheduler(QObject):
+    """Owns the single frame timer and steps every registered mascot at a fixed rate.
+
+    Physics runs in fixed steps of 1/physics_hz seconds, paced by a monotonic
+    clock rather than by counting timer ticks, so timer jitter and missed ticks
+    don't change how fast mascots move. The timer runs at `fps` (the render rate):
+    each tick runs the steps that are due (at most MAX_CATCH_UP_STEPS) and then
+    moves every mascot to its position interpolated between its last two steps.
+    `frame` counts physics steps.
+
+    With `adaptive` on, mascots standing or sitting still are stepped only every
+    few frames (as far as their animation and action Duration allow, see
+    MascotSim.idle_span), and on the frames they skip a cheap needs_wake() check
+    brings them back to full rate at once.
+    """
+
+    def __init__(self, fps=30, parent=None, adaptive=False, physics_hz=None, clock=perf_counter):
+        super().__init__(parent)
+        self.fps = fps
+        self.physics_hz = physics_hz or fps
+        self.clock = clock
+        self.frame = 0
+        self._entries = {}  # mascot -> [divider, phase, frame of its last step]
+        self._order = []    # stepping order (registration order)
+        self._next_phase = 0
+        self.adaptive = adaptive
+        self._last_time = None # Clock reading at the previous tick
+        self._accumulator = 0.0 # Seconds of physics not yet stepped
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self._tick)
+
+    # --- Registration ---
+
+    def register(self, mascot, divider=1):
+        """Adds a mascot to the frame pass. Divided mascots get staggered phases
+        so that they don't all land on the same frame."""
+        if mascot in self._entries:
+            return
+        divider = max(1, int(divider))
+        phase = self._next_phase % divider
+        self._next_phase += 1
+        self._entries[mascot] = [divider, phase, self.frame]
+        self._order.append(mascot)
+        mascot.scheduler = self
+        mascot.interpolated = True
+        self._apply_rate(mascot)
+
+    def unregister(self, mascot):
+        if self._entries.pop(mascot, None) is not None:
+            self._order.remove(mascot)
+            mascot.scheduler = None
+            mascot.interpolated = False
+
+    def set_divider(self, mascot, divider, immediate=True):
+        """Steps the mascot only every `divider` frames (time is scaled to match).
+        The next step is on the next frame, or `divider` frames after the current
+        one if not `immediate` (for a mascot just stepped with the new rate in mind)."""
+        entry = self._entries.get(mascot)
+        if entry is None:
+            return
+        divider = max(1, int(divider))
+        if entry[0] == divider:
+            return
+        entry[0] = divider
+        entry[1] = (self.frame + (1 if immediate else 0)) % divider
+        self._apply_rate(mascot)
+
+    def get_divider(self, mascot):
+        entry = self._entries.get(mascot)
+        return entry[0] if entry else 1
+
+    def mascots(self):
+        return list(self._order)
+
+    def __len__(self):
+        return len(self._order)
+
+    # --- Timing ---
+
+    def set_fps(self, fps):
+        """Sets the render rate (timer ticks per second)."""
+        self.fps = fps
+        if self.timer.isActive():
+            self.timer.setInterval(self.interval())
+
+    def set_physics_hz(self, hz):
+        """Sets the physics rate; speeds stay the same, only the step size changes."""
+        self.physics_hz = hz
+        self._accumulator = 0.0
+        for m in self._order:
+            self._apply_rate(m)
+
+    def interval(self):
+        return int(1000 / self.fps)
+
+    def step_seconds(self):
+        return 1.0 / self.physics_hz
+
+    def _apply_rate(self, mascot):
+        # Stepping every N frames means each step has to cover N frames of time
+        divider = self._entries[mascot][0]
+        mascot.fps = self.physics_hz / divider
+        mascot.time_scale = (30.0 / self.physics_hz) * divider
+
+    # --- Run state ---
+
+    def start(self):
+        self._last_time = None
+        self.timer.start(self.interval())
+
+    def pause(self):
+        self.timer.stop()
+
+    def resume(self):
+        if not self.timer.isActive():
+            self.start()
+
+    def toggle(self):
+        if self.timer.isActive():
+            self.pause()
+        else:
+            self.resume()
+
+    def is_paused(self):
+        return not self.timer.isActive()
+
+    def _tick(self):
+        inst = _instruments
+        frame_start = perf_counter() if inst.enabled else None
+        dt = self.step_seconds()
+        now = self.clock()
+        if self._last_time is None:
+            # First tick after (re)starting: one step, not the time spent paused
+            self._accumulator = dt
+        else:
+            self._accumulator += now - self._last_time
+        self._last_time = now
+
+        steps = 0
+        while self._accumulator >= dt:
+            if steps == MAX_CATCH_UP_STEPS:
+                if frame_start is not None:
+                    inst.count("scheduler.dropped_steps", int(self._accumulator / dt))
+                self._accumulator %= dt
+                break
+            self.step(frame_start)
+            self._accumulator -= dt
+            steps += 1
+
+        self.render(self._accumulator / dt)
+        if frame_start is not None:
+            inst.frame(frame_start, 1.0 / self.fps)
+
+    def step(self, frame_start=None):
+        """Runs one physics step for every mascot due on it."""
+        inst = _instruments
+        self.frame += 1
+        # Where every mascot is, for mascot-to-mascot queries during the step
+        if frame_start is None:
+            desktops = rebuild_grids(self._order)
+        else:
+            start = perf_counter()
+            desktops = rebuild_grids(self._order)
+            inst.record("mascot_grid.rebuild", start)
+        frame = self.frame
+        entries = self._entries
+        due = []
+        # Copy: a mascot may unregister itself while being stepped
+        for m in tuple(self._order):
+            entry = entries.get(m)
+            if entry is None:
+                continue
+            divider = entry[0]
+            if divider == 1 or frame % divider == entry[1]:
+                due.append(m)
+            elif m.needs_wake():
+                self.set_divider(m, 1)
+                due.append(m)
+                if frame_start is not None:
+                    inst.count("scheduler.wakes")
+            else:
+                continue
+            entry[2] = frame
+        for m in due:
+            if m in entries:
+                if frame_start is None:
+                    m.game_loop()
+                else:
+                    start = perf_counter()
+                    m.game_loop()
+                    inst.record("game_loop", start)
+        if self.adaptive:
+            for m in due:
+                self._adapt(m)
+        # Window moves the mascots asked for, one batch per desktop
+        for desktop in desktops:
+            desktop.flush_window_moves()
+
+    def render(self, alpha):
+        """Moves every mascot to its interpolated position; `alpha` is how far
+        (0..1) the clock is into the current physics step."""
+        entries = self._entries
+        frame = self.frame
+        for m in tuple(self._order):
+            entry = entries.get(m)
+            if entry is None:
+                continue
+            # A divided mascot's last step covers `divider` physics steps
+            divider = entry[0]
+            if divider == 1:
+                m.render(alpha)
+            else:
+                m.render(min(1.0, (frame - entry[2] + alpha) / divider))
+
+    def _adapt(self, mascot):
+        # Rate for the mascot's next steps, from how long it can go without one
+        entry = self._entries.get(mascot)
+        if entry is None:
+            return
+        span = mascot.idle_span()
+        divider = 1
+        if span is not None:
+            divider = max(1, min(MAX_IDLE_DIVIDER, int(span / (30.0 / self.physics_hz))))
+        if divider != entry[0]:
+            self.set_divider(mascot, divider, immediate=divider == 1)
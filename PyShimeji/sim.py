@@ -0,0 +1,103 @@
+"""Headless simulation: steps mascots against an in-memory desktop, without widgets.
+
+Run from the PyShimeji folder:  python sim.py --mascots 100 --ticks 3000
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from pack_cache import load_or_build  # needs PyQt6.QtGui, but no display
+from pack_data import PackData
+from desktop import Desktop
+from window_source import FakeWindowSource
+from monitor_topology import FakeMonitorTopology
+from simulation import MascotSim
+from mascot_grid import rebuild_grids
+from sample_data import synthetic_windows, bundled_zips
+
+
+def build_desktop(window_count=20, screens=None, seed=1):
+    """A Desktop with fixed monitors and `window_count` random windows."""
+    screens = FakeMonitorTopology.DUAL_1080P if screens is None else screens
+    width = max(s[2] for s in screens)
+    height = max(s[3] for s in screens)
+    windows = synthetic_windows(window_count, seed, width, height)
+    return Desktop(FakeWindowSource(windows), lambda: screens)
+
+
+def load_packs(zip_paths):
+    packs = []
+    for zip_path in zip_paths:
+        compiled, _ = load_or_build(zip_path)
+        packs.append(PackData(compiled, os.path.splitext(os.path.basename(zip_path))[0]))
+    return packs
+
+
+def create_mascots(packs, count, desktop, config=None, seed=0):
+    """`count` mascots spread over the packs, mascot i seeded with seed + i."""
+    return [MascotSim(packs[i % len(packs)], desktop, config, seed + i) for i in range(count)]
+
+
+def state_hash(mascots):
+    """Digest of every mascot's position, velocity and state, to compare runs."""
+    h = hashlib.sha1()
+    for m in mascots:
+        h.update(repr((round(m._x_float, 6), round(m._y_float, 6), round(m.velocity_x, 6),
+                       round(m.velocity_y, 6), m.current_behavior, m.current_action_name)).encode())
+    return h.hexdigest()[:16]
+
+
+def run(mascots, ticks):
+    """Steps every mascot `ticks` times."""
+    start = time.perf_counter()
+    for _ in range(ticks):
+        desktops = rebuild_grids(mascots)
+        for m in mascots:
+            m.game_loop()
+        for desktop in desktops:
+            desktop.flush_window_moves()
+    seconds = time.perf_counter() - start
+    return {
+        'mascots': len(mascots),
+        'ticks': ticks,
+        'seconds': seconds,
+        'ticks_per_second': ticks / seconds if seconds else 0.0,
+        'mascot_ticks_per_second': ticks * len(mascots) / seconds if seconds else 0.0,
+        'state_hash': state_hash(mascots),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run mascots headless and report ticks/second.")
+    parser.add_argument("--mascots", type=int, default=10)
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--windows", type=int, default=20, help="random windows on the fake desktop")
+    parser.add_argument("--fps", type=int, default=30, help="tick rate the physics is scaled for")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pack", action="append", help="mascot zip (default: the bundled ones)")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args(argv)
+
+    zip_paths = args.pack or bundled_zips()
+    if not zip_paths:
+        parser.error("no mascot zips found; pass --pack")
+
+    packs = load_packs(zip_paths)
+    desktop = build_desktop(args.windows, seed=args.seed + 1)
+    config = {"fps": args.fps, "sound": False}
+    mascots = create_mascots(packs, args.mascots, desktop, config, args.seed)
+    result = run(mascots, args.ticks)
+    result['packs'] = [os.path.basename(p) for p in zip_paths]
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{result['mascots']} mascots, {result['ticks']} ticks in {result['seconds']:.2f} s: "
+              f"{result['ticks_per_second']:.0f} ticks/s, "
+              f"{result['mascot_ticks_per_second']:.0f} mascot ticks/s (state {result['state_hash']})")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1075 @@
+import random
+import math
+from time import perf_counter
+from instruments import shared_instruments
+from edge_index import FLOOR_TOLERANCE, WALL_MARGIN
+from expressions import Environment, test
+from action_program import (ActionRunner, KIND_WALK, KIND_STAND, KIND_CLING, KIND_CLIMB, KIND_JUMP, KIND_FALL,
+                            KIND_CARRY, KIND_CARRY_FALL, KIND_THROW_WINDOW)
+
+# Physics Constants
+GRAVITY = 1
+MAX_FALL_SPEED = 40
+WALK_SPEED = 4.0
+CLIMB_SPEED = 3.0
+JUMP_SPEED = 20.0 # Jump's default VelocityParam
+
+# Physical state each kind of program action puts the mascot in, and where that happens
+KIND_MODES = {KIND_WALK: "Walk", KIND_STAND: "Stand", KIND_CLING: "Cling", KIND_CLIMB: "Climb",
+              KIND_CARRY: "Carry", KIND_THROW_WINDOW: "ThrowWindow"}
+MODE_PLACEMENT = {"Walk": "floor", "Stand": "floor", "Sit": "floor", "Cling": "wall", "Climb": "wall",
+                  "Carry": "floor", "ThrowWindow": "floor"}
+
+# Chance per 30 FPS tick that an action with no Duration or target ends
+OPEN_ENDED_CHANCE = {"Walk": 0.02, "Stand": 0.007, "Sit": 0.007, "Cling": 0.025, "Climb": 0.01,
+                     "Carry": 0.02, "ThrowWindow": 0.02}
+# The built-in routine for packs without behaviors.xml: (next states, weights)
+BUILT_IN_NEXT = {
+    "Walk": (("Stand",), (1,)),
+    "Stand": (("Walk", "Sit"), (5, 2)),
+    "Sit": (("Walk", "Stand"), (5, 2)),
+    "Cling": (("Climb", "Fall"), (4, 1)),
+    "Climb": (("Fall",), (1,)),
+}
+
+# States in which a still mascot may be stepped at a lower rate, and how close
+# (in pixels) the cursor has to come to bring it back to full rate
+IDLE_BEHAVIORS = ("Stand", "Sit")
+WAKE_DISTANCE = 150
+
+# Mascot-to-mascot contact, in pixels. A head is HEAD_HEIGHT of the anchor height
+# above the foot and HEAD_HALF_WIDTH wide on each side; feet within HEAD_SEARCH
+# below are searched for heads. Walkers turn around within BUMP_DISTANCE of a
+# mascot ahead of them on the same floor.
+HEAD_HEIGHT = 0.75
+HEAD_HALF_WIDTH = 30
+HEAD_SEARCH = 160
+BUMP_DISTANCE = 60
+
+# Chance that a walker starts pushing a window it runs into (with move_windows on)
+PUSH_CHANCE = 0.3
+
+# How far (pixels, each way) from where FallWithIE/WalkWithIE hold the active
+# window its corner may be for them to take hold of it (with move_windows on)
+GRAB_REACH = 48
+
+_instruments = shared_instruments()
+
+class MascotSim:
+    """One mascot's state and step function, without any widget.
+
+    Everything the simulation reads from the outside comes through `desktop` (a
+    Desktop: monitors, windows, collisions, other mascots) and `view`; all randomness comes from
+    `rng`, seeded per mascot, so a run with the same seeds and desktop is
+    reproducible. `view` is the widget showing the mascot (see Mascot) and may be
+    None to run headless: it provides move(x, y), show_frame(frame, entered),
+    cursor_pos() and window_id().
+    """
+
+    def __init__(self, pack, desktop, config=None, seed=None, view=None):
+        self.pack = pack
+        self.actions = pack.actions
+        self.desktop = desktop
+        self.config = config or {}
+        self.rng = random.Random(seed)
+        self.view = view
+        
+        # State
+        self.current_action = None
+        self.current_action_name = ""
+        self.current_behavior = "Fall" 
+        self.behavior = None # behaviors.xml Behavior being acted out, if any
+        self.behavior_mode = None # State its program last put the mascot in
+        self.runner = ActionRunner() # Steps the behavior's action program
+        self.frame_index = 0
+        self.velocity_x = 0
+        self.velocity_y = 0
+        self.facing_right = False
+        self.ticks_in_frame = 0
+        self.frame_entered = True # Current animation frame hasn't been shown yet
+        
+        # Current Frame Data
+        self.current_anchor_x = 0
+        self.current_anchor_y = 0
+
+        # Dirty tracking: how many moves/repaints were issued vs skipped as unchanged
+        self.render_stats = {'moves': 0, 'moves_skipped': 0, 'repaints': 0, 'repaints_skipped': 0}
+        
+        # Environment
+        self.current_window = None # (hwnd, rect) if standing on a window
+        self.carrier = None # Mascot whose head this one stands on
+        self.pushing = None # hwnd of the window being pushed along
+        self.active_window = None # (hwnd, rect, ...) of the window conditions call activeIE
+        self.carrying = None # (hwnd, offset x, offset y, holds left edge) of the window held or thrown
+        self.window_velocity = [0.0, 0.0, 0.0] # vx, vy, gravity of a thrown window
+        self.env = Environment() # Snapshot read by behaviors.xml/actions.xml conditions, refreshed each tick
+        self.env.random = self.rng.random
+        self.drag_foot_x = 0.0 # Lagging foot position while dragged (FootX in the Pinched animations)
+
+        # Timing (driven by a shared MascotScheduler, which keeps these in sync)
+        self.fps = self.config.get("fps", 30)
+        self.time_scale = 30.0 / self.fps # Normalization factor relative to 30FPS
+        self.scheduler = None
+
+        # Dragging (set by the view)
+        self.dragging = False
+        
+        # Initial Drop, above the monitor at the origin
+        sl, st, sr, sb = self.desktop.get_topology().screen_at(0, 0)
+        self._x_float = float(self.rng.randint(sl + 100, sr - 100))
+        self._y_float = float(st - 100)
+        self.pos = (int(self._x_float), int(self._y_float)) # Last applied pixel position
+        # Position at the start of the last step, for render(); with `interpolated`
+        # set (by the scheduler) the view is only moved by render()
+        self.prev_x = self._x_float
+        self.prev_y = self._y_float
+        self.interpolated = False
+        self.corner_ticks = 0
+
+        # Per-tick state shared by the game_loop phases (set by begin_tick)
+        self.foot_x = 0.0
+        self.foot_y = 0.0
+        self.topology = None
+        self.tick_screen = None
+        self.target_floor = 0
+        self.on_floor = False
+        self.gravity = 0.0 # Gravity multiplier for integrate(), 0 when not airborne
+        self.windows_version = -1 # Desktop window cache the floor was last found in
+
+    def teleport_to_random_pos(self):
+        screens = self.desktop.get_screens_info()
+        if not screens: return
+        
+        # Pick random screen
+        screen = self.rng.choice(screens)
+        sl, st, sr, sb = screen[0], screen[1], screen[2], screen[3]
+        
+        margin = 30
+        new_x = self.rng.randint(sl + margin, sr - margin)
+        new_y = self.rng.randint(st + margin, sb - margin)
+        
+        # Move and sync
+        self.place(new_x - self.current_anchor_x, new_y - self.current_anchor_y)
+        
+        # Reset state
+        self.velocity_x = 0
+        self.velocity_y = 0
+        self.current_behavior = "Fall"
+        self.set_action("Falling")
+        self.wake()
+
+    def set_action(self, action_name):
+        # Resolution (exact, partial, fallbacks) is precomputed per pack
+        name = self.pack.resolve_action(action_name)
+        if name is None:
+            return
+        self.current_action = self.actions[name]
+        self.current_action_name = name
+        self.frame_index = 0
+        self.ticks_in_frame = 0
+        self.frame_entered = True
+
+    def next_behavior(self, placement):
+        """Enters the next behavior from the pack's behaviors.xml graph.
+        Returns False if nothing in the graph can be played here ("floor" or "wall")."""
+        current = self.behavior.name if self.behavior else None
+        behavior = self.pack.behavior_graph.sample_next(current, self.env, placement, self.rng)
+        if behavior is None:
+            return False
+        self.behavior = behavior
+        self.runner.start(self.pack.programs[behavior.name])
+        self.advance_behavior()
+        return True
+
+    def advance_behavior(self):
+        """Moves the behavior's program on to its next action. Returns False when the
+        behavior is over: the program finished, or a fall handed the mascot to physics."""
+        env = self.env
+        runner = self.runner
+        if not runner.next_leaf(env, self):
+            self.behavior = None
+            return False
+        kind = runner.kind
+        if kind == KIND_JUMP:
+            # Flies to the target (on the desktop), then the program goes on (see jump_step)
+            if runner.target_x is None:
+                runner.target_x = env.anchor_x
+            runner.target_x = min(max(runner.target_x, self.topology.min_x), self.topology.max_x)
+            if runner.target_y is None:
+                runner.target_y = env.anchor_y
+            self.current_behavior = self.behavior_mode = "Jump"
+            self.set_action(runner.action)
+            return True
+        if kind in (KIND_CARRY, KIND_CARRY_FALL) and not self.grab_window():
+            self.behavior = None # Not holding the window (the jump fell short, or moving windows is off)
+            return False
+        if kind == KIND_THROW_WINDOW and self.carrying is None:
+            self.behavior = None
+            return False
+        if kind == KIND_CARRY_FALL:
+            self.current_behavior = self.behavior_mode = "CarryFall"
+            self.velocity_x = 0.0
+            self.set_action(runner.action)
+            return True
+        if kind == KIND_FALL:
+            self.current_behavior = "Fall"
+            self.set_action(runner.action)
+            self.behavior = None
+            return False
+        mode = KIND_MODES.get(kind)
+        if mode is None: # Ceiling actions aren't supported
+            self.behavior = None
+            return False
+
+        if MODE_PLACEMENT[mode] == "wall" and self.current_behavior not in ("Cling", "Climb"):
+            # Onto the wall the mascot has walked up to, if it really got there
+            wall = self.wall_at_anchor(env.anchor_x, env.anchor_y)
+            if wall is None:
+                self.behavior = None
+                return False
+            self.climb_wall_x, self.facing_right = wall
+        self.current_behavior = mode
+        self.behavior_mode = mode
+        if mode not in ("Walk", "Carry"):
+            self.velocity_x = 0.0
+        if mode == "ThrowWindow":
+            vx, vy, gravity = runner.params
+            vx = vx or 0.0
+            self.window_velocity[:] = (vx if self.facing_right else -vx, vy or 0.0, gravity or 0.0)
+        self.set_action(runner.action)
+        return True
+
+    def wall_at_anchor(self, foot_x, foot_y):
+        """Wall next to the foot that a wall action can start on, as (x, facing right):
+        a work area edge or a window side within WALL_MARGIN. None if there is none
+        (e.g. the walk to the wall was cut short)."""
+        env = self.env
+        if abs(foot_x - env.work_left) <= WALL_MARGIN:
+            return env.work_left, False
+        if abs(env.work_right - foot_x) <= WALL_MARGIN:
+            return env.work_right, True
+        if self.config.get("interact_windows", True):
+            for dx in ((1, -1) if self.facing_right else (-1, 1)):
+                hit = self.desktop.get_vertical_wall_collision(foot_x, foot_y, dx, self.window_id())
+                if hit and not hit[2]:
+                    return hit[1], hit[0] == "Right"
+        return None
+
+    def action_done(self, foot_x, foot_y):
+        """True once the program's current action has run its course."""
+        runner = self.runner
+        ts = self.time_scale
+        runner.elapsed += ts
+        if runner.kind in (KIND_WALK, KIND_CARRY) and runner.target_x is not None:
+            return abs(runner.target_x - foot_x) <= max(1.0, abs(self.velocity_x) * ts)
+        if runner.kind == KIND_CLIMB and runner.target_y is not None:
+            return abs(runner.target_y - foot_y) <= max(1.0, abs(self.velocity_y) * ts)
+        if runner.duration is not None:
+            return runner.elapsed >= runner.duration
+        return self.rng.random() < OPEN_ENDED_CHANCE[self.current_behavior] * ts
+
+    def run_behavior(self, foot_x, foot_y):
+        """Steps the running behavior; when it ends where it stands the next one is
+        picked. Returns False if no behavior is running."""
+        if self.behavior is None:
+            return False
+        if self.action_done(foot_x, foot_y):
+            mode = self.current_behavior
+            if not self.advance_behavior() and self.current_behavior == mode:
+                self.next_behavior(MODE_PLACEMENT[mode])
+        return True
+
+    def jump_step(self, foot_x, foot_y):
+        """One tick of the Jump embedded action: heads for the target at JUMP_SPEED,
+        aiming above it by half the distance left across so that the path arcs.
+        Floors don't stop it. True once there (the foot is put on the target)."""
+        runner = self.runner
+        dx = runner.target_x - foot_x
+        dy = runner.target_y - foot_y - abs(dx) / 2
+        distance = math.hypot(dx, dy)
+        if distance <= JUMP_SPEED * self.time_scale:
+            self._x_float = runner.target_x - self.current_anchor_x
+            self._y_float = runner.target_y - self.current_anchor_y
+            self.velocity_x = 0.0
+            self.velocity_y = 0.0
+            return True
+        self.velocity_x = JUMP_SPEED * dx / distance
+        self.velocity_y = JUMP_SPEED * dy / distance
+        if dx:
+            self.facing_right = dx > 0
+        return False
+
+    def look(self, look_right):
+        """Look embedded action: face a direction, or turn around if none is given."""
+        self.facing_right = (not self.facing_right) if look_right is None else bool(look_right)
+
+    def offset(self, dx, dy):
+        """Offset embedded action: shift the mascot."""
+        self._x_float += dx
+        self._y_float += dy
+
+    def update_environment(self, foot_x, foot_y, screen, floor_y, on_floor):
+        """Refreshes the condition snapshot in place for this tick."""
+        env = self.env
+        cursor_x, cursor_y = self.cursor_pos()
+        env.cursor_dx = cursor_x - env.cursor_x
+        env.cursor_dy = cursor_y - env.cursor_y
+        env.cursor_x = cursor_x
+        env.cursor_y = cursor_y
+        sl, st, sr, sb = screen
+        env.screen_width = sr - sl
+        env.screen_height = sb - st
+        env.set_work_area(sl, st, sr, floor_y)
+        env.anchor_x = foot_x
+        env.anchor_y = foot_y
+        env.look_right = self.facing_right
+        env.total_count = len(self.scheduler) if self.scheduler is not None else 1
+
+        if self.current_window:
+            self.active_window = self.current_window
+        else:
+            windows = self.desktop.get_windows() if self.config.get("interact_windows", True) else None
+            self.active_window = windows[0] if windows else None
+        env.set_active_window(self.active_window[1] if self.active_window else None)
+
+        env.on_floor = on_floor and not self.current_window
+        env.on_ie_top = on_floor and bool(self.current_window)
+        on_wall = self.current_behavior in ("Cling", "Climb") and hasattr(self, 'climb_wall_x')
+        at_left = on_wall and abs(self.climb_wall_x - sl) < 2
+        at_right = on_wall and abs(self.climb_wall_x - sr) < 2
+        env.on_work_left = at_left
+        env.on_work_right = at_right
+        # Clinging to a window: facing right means holding its left edge
+        env.on_ie_left = on_wall and not (at_left or at_right) and self.facing_right
+        env.on_ie_right = on_wall and not (at_left or at_right) and not self.facing_right
+
+        env.variables['FootX'] = foot_x
+        if self.behavior is not None and self.runner.target_y is not None:
+            env.variables['TargetY'] = self.runner.target_y
+        else:
+            env.variables['TargetY'] = st + 30 # Unguided climbing heads for the top of the screen
+
+    def choose_frames(self, animations):
+        """Frames of the first animation whose condition holds (the first one if none does)."""
+        for condition, frames in animations:
+            if condition is None or test(condition, self.env):
+                return frames
+        return animations[0][1]
+
+    def idle_turn(self, placement):
+        """With no behavior running, behaviors.xml picks the next one right away. Packs
+        without one (or with nothing playable here) follow BUILT_IN_NEXT, whose states
+        end like open-ended actions."""
+        mode = self.current_behavior
+        if self.next_behavior(placement) and (self.behavior is not None or self.current_behavior != mode):
+            return # (a behavior that can't start here doesn't count)
+        if self.rng.random() < OPEN_ENDED_CHANCE[self.current_behavior] * self.time_scale:
+            states, weights = BUILT_IN_NEXT[self.current_behavior]
+            self.enter_built_in(self.rng.choices(states, weights)[0])
+
+    def enter_built_in(self, state):
+        if state == "Fall":
+            # Lets go of the wall
+            self.velocity_x = -5.0 if self.facing_right else 5.0
+        elif state != "Walk": # Walk picks its animation once moving
+            self.velocity_x = 0.0
+            self.set_action("ClimbWall" if state == "Climb" else state)
+        self.current_behavior = state
+
+    def looks_moving(self):
+        """True if the current action is a walk/run style animation."""
+        name = self.current_action_name
+        return ((self.current_action is not None and self.current_action['type'] == "Move")
+                or "Walk" in name or "Run" in name)
+
+    def is_playing(self, action_name):
+        """True if the current action is what set_action(action_name) would pick."""
+        return self.current_action_name == self.pack.resolve_action(action_name)
+
+    def game_loop(self):
+        # One tick: sense, land, decide, move, then show it
+        if not self.begin_tick():
+            return
+        self.snap_to_floor()
+        if not self.think():
+            return
+        self.integrate()
+        self.end_tick()
+
+    def begin_tick(self):
+        """Animation, drag handling and sensing (floor, screen, window) for this tick.
+        Returns False if the mascot is being dragged and skips the physics."""
+        self.prev_x = self._x_float
+        self.prev_y = self._y_float
+        if _instruments.enabled:
+            start = perf_counter()
+            self.update_animation()
+            _instruments.record("update_animation", start)
+        else:
+            self.update_animation()
+
+        # Anything outside the behavior's program (falls, throws, drags) ends it
+        if self.behavior is not None and self.behavior_mode != self.current_behavior:
+            self.behavior = None
+
+        if self.dragging:
+            self.set_action("Pinched") 
+            self.velocity_x = 0
+            self.velocity_y = 0
+            # The body swings after the cursor; Pinched animations compare FootX with it
+            cursor_x = self.cursor_pos()[0]
+            self.drag_foot_x += (cursor_x - self.drag_foot_x) * min(1.0, 0.1 * self.time_scale)
+            self.env.cursor_x = cursor_x
+            self.env.variables['FootX'] = self.drag_foot_x
+            return False
+
+        # Use internal float position
+        foot_x = self._x_float + self.current_anchor_x
+        foot_y = self._y_float + self.current_anchor_y
+
+        # Environment - monitor layout is cached and only rebuilt when screens change
+        topology = self.desktop.get_topology()
+        
+        # Determine Floor (Global Awareness)
+        target_floor = topology.floor_at(foot_x, foot_y)
+        # Check for Windows for FLOOR
+        if self.config.get("interact_windows", True):
+            win = self.desktop.get_window_under_foot(foot_x, foot_y, self.window_id(), self.velocity_y)
+            self.windows_version = self.desktop.windows_version
+            if win:
+                target_floor = win[1][1]
+                self.current_window = win
+            else:
+                self.current_window = None
+        # Other mascots' heads are floors too; riders move along with their carrier.
+        # Nobody fits between a foot already on the floor and the floor.
+        self.carrier = None
+        if (self.velocity_y >= 0 and target_floor - foot_y > FLOOR_TOLERANCE
+                and self.config.get("interact_mascots", True)):
+            carrier = self.carrier_under_foot(foot_x, foot_y)
+            if carrier is not None and carrier.head_y() < target_floor:
+                shift = carrier._x_float - carrier.prev_x
+                self._x_float += shift
+                foot_x += shift
+                target_floor = carrier.head_y()
+                self.carrier = carrier
+
+        self.foot_x = foot_x
+        self.foot_y = foot_y
+        self.topology = topology
+        self.tick_screen = topology.screen_at(foot_x, foot_y)
+        self.target_floor = target_floor
+        self.on_floor = False
+        return True
+
+    def snap_to_floor(self):
+        """Lands on the floor if falling onto (or through) it."""
+        if self.current_behavior == "Jump":
+            return # Flies through floors on its way to the target
+        if self.velocity_y >= 0 and self.foot_y >= self.target_floor - 5:
+            self._y_float = self.target_floor - self.current_anchor_y
+            self.velocity_y = 0.0
+            self.foot_y = self.target_floor
+            self.on_floor = True
+
+    def think(self):
+        """Behavior logic for this tick. Sets velocities and self.gravity (the
+        gravity multiplier while airborne) for integrate(). Returns False if the
+        mascot was relaunched and the rest of the tick is skipped."""
+        foot_x = self.foot_x
+        foot_y = self.foot_y
+        on_floor = self.on_floor
+        topology = self.topology
+        current_screen = self.tick_screen
+        target_floor = self.target_floor
+        sl, st, sr, sb = current_screen
+        ts = self.time_scale
+        self.gravity = 0.0
+        was_pushing = self.pushing # Only kept up by walking into the same window again
+        self.pushing = None
+
+        # Prevent "Walking" or "Sitting" in the Sky
+        # If we are above the monitor floor and not standing on a window, force falling behavior
+        is_in_sky = foot_y < st - 10
+        if is_in_sky and not self.current_window and self.current_behavior not in ["Thrown", "Jump", "Cling", "Climb"]:
+             self.current_behavior = "Fall"
+             self.set_action("Falling")
+             
+        # High-Velocity Recovery (Faster Gravity when way off screen)
+        # 10x gravity if more than 2000px up, 5x if more than 500px up
+        gravity_mult = 1.0
+        if foot_y < st - 2000:
+            gravity_mult = 10.0
+        elif foot_y < st - 500:
+            gravity_mult = 5.0 
+        
+        # --- Corner Failsafe ---
+        # Only true outer edges (no monitor in that direction)
+        at_left_edge = abs(foot_x - sl) < 15 and not topology.is_x_in_any_monitor(foot_x - 20)
+        at_right_edge = abs(foot_x - sr) < 15 and not topology.is_x_in_any_monitor(foot_x + 20)
+        at_bottom_edge = abs(foot_y - target_floor) < 15
+        
+        if (at_left_edge or at_right_edge) and at_bottom_edge:
+            self.corner_ticks += 1
+            if self.corner_ticks >= 5 * self.fps:
+                # LAUNCH toward center of monitor
+                self.corner_ticks = 0
+                cx, cy = (sl + sr) / 2, (st + sb) / 2
+                dx = cx - foot_x
+                dy = cy - foot_y
+                dist = math.sqrt(dx*dx + dy*dy)
+                if dist > 0:
+                    # Teleport OUT of the corner first to clear any 'sticky' boundary checks
+                    nudge = 20
+                    nx = foot_x + (dx / dist) * nudge
+                    ny = foot_y + (dy / dist) * nudge
+                    self._x_float = nx - self.current_anchor_x
+                    self._y_float = ny - self.current_anchor_y
+                    self.apply_position()
+
+                    # Random "bounce" velocity biased toward center
+                    power = self.rng.uniform(self.config.get("launch_power_min", 15), self.config.get("launch_power_max", 25))
+                    self.velocity_x = (dx / dist) * power + self.rng.uniform(-2, 2)
+                    self.velocity_y = (dy / dist) * power - 20 # Stronger upward kick
+                    self.current_behavior = "Thrown"
+                    self.set_action("Falling")
+                    return False # Skip rest of loop for this tick
+        else:
+            self.corner_ticks = 0
+
+        self.update_environment(foot_x, foot_y, current_screen, target_floor, on_floor)
+
+        # Behavior Logic
+        if self.current_behavior == "Thrown":
+            if on_floor:
+                self.current_behavior = "Stand"
+                self.set_action("Stand")
+                self.velocity_x = 0.0
+                self.velocity_y = 0.0
+            else:
+                self.gravity = gravity_mult # Gravity and air drag are applied by integrate()
+                
+                # Check for Wall Hit while flying
+                if foot_y < target_floor - 10:
+                    hit_info = self.desktop.get_vertical_wall_collision(foot_x, foot_y, self.velocity_x * ts, self.window_id(),
+                                                                        self.velocity_y * ts)
+                    if hit_info:
+                        side, wall_x, is_sky_wall, is_window, hwnd = hit_info
+                        # Only hit if moving TOWARDS the wall
+                        if (side == "Left" and self.velocity_x < -1) or (side == "Right" and self.velocity_x > 1):
+                            if is_sky_wall:
+                                # BOUNCE off sky wall
+                                self.velocity_x *= -0.6
+                                self._x_float = wall_x - self.current_anchor_x
+                            else:
+                                # CLING to wall (Window or Monitor boundary)
+                                self.current_behavior = "Cling"
+                                self.velocity_x = 0.0
+                                self.velocity_y = 0.0
+                                self.gravity = 0.0
+                                self.climb_wall_x = wall_x # Store for pinning
+                                self._x_float = wall_x - self.current_anchor_x
+                                self.facing_right = (side == "Right") 
+                                self.set_action("GrabWall")
+
+        elif self.current_behavior == "Cling":
+            self.velocity_x = 0.0
+            self.velocity_y = 0.0
+            # Pin to wall
+            if hasattr(self, 'climb_wall_x'):
+                self._x_float = self.climb_wall_x - self.current_anchor_x
+                
+            if on_floor:
+                self.current_behavior = "Stand"
+                self.set_action("Stand")
+            elif not self.run_behavior(foot_x, foot_y):
+                self.idle_turn("wall")
+                
+        elif self.current_behavior == "Climb":
+             self.velocity_x = 0.0
+             # Up, unless the behavior's TargetY is below; never past the work area
+             target_y = self.runner.target_y if self.behavior is not None else None
+             if target_y is not None:
+                 target_y = self.runner.target_y = min(max(target_y, st), target_floor)
+             climbing_down = target_y is not None and target_y > foot_y
+             self.velocity_y = (CLIMB_SPEED if climbing_down else -CLIMB_SPEED) * ts
+             # Pin to wall
+             if hasattr(self, 'climb_wall_x'):
+                 self._x_float = self.climb_wall_x - self.current_anchor_x
+             
+             climb_action = self.runner.action if self.behavior is not None else "ClimbWall"
+             if not self.is_playing(climb_action):
+                 self.set_action(climb_action)
+             
+             if foot_y <= st + 30:
+                 self.current_behavior = "Fall"
+                 self.velocity_x = -5.0 if self.facing_right else 5.0
+             elif on_floor and target_y is not None and target_y >= foot_y:
+                 # Climbed down to the floor, or the target is at or below it: off the wall
+                 self.current_behavior = "Stand"
+                 self.set_action("Stand")
+                 self.velocity_y = 0.0
+             elif not self.run_behavior(foot_x, foot_y):
+                 self.idle_turn("wall")
+
+        elif self.current_behavior == "Fall":
+            if on_floor:
+                self.current_behavior = "Stand"
+                self.set_action("Stand")
+            else:
+                self.gravity = gravity_mult
+                if not self.is_playing("Falling") and self.velocity_y > 2:
+                    self.set_action("Falling")
+
+        elif self.current_behavior == "Jump":
+            if self.behavior is None or self.jump_step(foot_x, foot_y):
+                if not self.advance_behavior() and self.current_behavior == "Jump":
+                    self.current_behavior = "Stand" if on_floor else "Fall"
+                    self.set_action("Stand" if on_floor else "Falling")
+
+        elif self.current_behavior == "CarryFall":
+            # Down with the window held overhead, then on to the program's next action
+            self.velocity_x = 0.0
+            if not on_floor:
+                self.gravity = gravity_mult
+            elif not self.advance_behavior() and self.current_behavior == "CarryFall":
+                self.current_behavior = "Stand"
+                self.set_action("Stand")
+
+        elif self.current_behavior == "Carry":
+            if not on_floor:
+                self.current_behavior = "Fall"
+            else:
+                if self.behavior is not None and self.runner.target_x is not None:
+                    self.facing_right = self.runner.target_x > foot_x
+                vx = WALK_SPEED * ts
+                dx = vx if self.facing_right else -vx
+                self.velocity_x = dx
+                # No turning around with a window overhead: a wall, a mascot ahead or the
+                # window reaching the desktop edge is as far as it goes
+                hit_info = self.desktop.get_vertical_wall_collision(foot_x, foot_y, dx * ts, self.window_id())
+                blocked = hit_info is not None and (hit_info[0] == "Left") == (dx < 0)
+                if not blocked and self.config.get("interact_mascots", True):
+                    blocked = self.mascot_ahead(foot_x, foot_y, dx * ts)
+                if not blocked and self.carrying is not None:
+                    rect = self.desktop.get_window_rect(self.carrying[0])
+                    blocked = rect is None or rect[0] + dx * ts < topology.min_x or rect[2] + dx * ts > topology.max_x
+                if blocked:
+                    self.velocity_x = 0.0
+                    if self.behavior is not None and self.runner.target_x is not None:
+                        self.runner.target_x = foot_x
+
+                if not self.run_behavior(foot_x, foot_y):
+                    self.current_behavior = "Stand"
+                    self.set_action("Stand")
+                    self.velocity_x = 0.0
+
+        elif self.current_behavior == "ThrowWindow":
+            # Stands while the window flies off (moved by integrate)
+            self.velocity_x = 0.0
+            if not on_floor:
+                self.current_behavior = "Fall"
+            elif not self.run_behavior(foot_x, foot_y):
+                self.current_behavior = "Stand"
+                self.set_action("Stand")
+
+        elif self.current_behavior == "Walk":
+            if not on_floor:
+                self.current_behavior = "Fall"
+            else:
+                # Head for the behavior's TargetX, if it has one
+                if self.behavior is not None and self.runner.target_x is not None:
+                    self.facing_right = self.runner.target_x > foot_x
+                vx = WALK_SPEED * ts
+                dx = vx if self.facing_right else -vx
+                self.velocity_x = dx
+                
+                # Check for walls
+                hit_info = self.desktop.get_vertical_wall_collision(foot_x, foot_y, dx * ts, self.window_id())
+                if hit_info:
+                    side, wall_x, is_sky_wall, is_window, hwnd = hit_info
+                    # Only hit if moving TOWARDS the wall
+                    if (side == "Left" and self.velocity_x < 0) or (side == "Right" and self.velocity_x > 0):
+                        if is_window and self.push_window(hwnd, dx * ts, was_pushing):
+                            pass # Keeps walking, with the window going ahead
+                        elif not is_sky_wall and self.rng.random() < 0.1:
+                                self.current_behavior = "Cling"
+                                self.climb_wall_x = wall_x
+                                self._x_float = wall_x - self.current_anchor_x
+                                self.facing_right = (side == "Right")
+                                self.set_action("GrabWall")
+                        else:
+                                self.facing_right = not self.facing_right
+                                self.velocity_x = -dx
+                                if self.behavior is not None and self.runner.target_x is not None:
+                                    self.runner.target_x = foot_x # Blocked: as far as it gets
+
+                # Turn around at another mascot ahead on the same floor
+                if self.config.get("interact_mascots", True) and self.mascot_ahead(foot_x, foot_y, self.velocity_x * ts):
+                    self.facing_right = not self.facing_right
+                    self.velocity_x = -self.velocity_x
+                    if self.behavior is not None and self.runner.target_x is not None:
+                        self.runner.target_x = foot_x
+                
+                # (not if it just grabbed the wall)
+                if self.current_behavior == "Walk" and not self.run_behavior(foot_x, foot_y):
+                    self.idle_turn("floor")
+
+        elif self.current_behavior in ["Stand", "Sit"]:
+            self.velocity_x = 0.0
+            if on_floor and hasattr(self, 'climb_wall_x'):
+                delattr(self, 'climb_wall_x')
+
+            if not on_floor:
+                self.current_behavior = "Fall"
+            elif not self.run_behavior(foot_x, foot_y):
+                self.idle_turn("floor")
+                if self.behavior is None and not self.is_playing(self.current_behavior):
+                    self.set_action(self.current_behavior)
+
+        return True
+
+    def integrate(self):
+        """Gravity, air drag, movement and desktop clamping for this tick."""
+        ts = self.time_scale
+        if self.gravity:
+            self.velocity_y += GRAVITY * ts * self.gravity
+            if self.velocity_y > MAX_FALL_SPEED: self.velocity_y = MAX_FALL_SPEED
+            if self.current_behavior == "Thrown":
+                self.velocity_x *= (0.99 ** ts)
+
+        # Final Position Application
+        foot_x0 = self._x_float + self.current_anchor_x
+        foot_y0 = self._y_float + self.current_anchor_y
+        self._x_float += self.velocity_x * ts
+        self._y_float += self.velocity_y * ts
+
+        # Unified Boundary Clamping (Total Desktop)
+        min_x = self.topology.min_x
+        max_x = self.topology.max_x
+        
+        # Re-calc local foot_x after movement
+        new_fx = self._x_float + self.current_anchor_x
+        if new_fx < min_x:
+            self._x_float = min_x - self.current_anchor_x
+            if self.velocity_x < 0: self.velocity_x = 0
+        elif new_fx > max_x:
+            self._x_float = max_x - self.current_anchor_x
+            if self.velocity_x > 0: self.velocity_x = 0
+
+        self.stop_at_crossed_floor(foot_x0, foot_y0)
+        if self.carrying is not None:
+            self.move_carried_window()
+
+    def stop_at_crossed_floor(self, foot_x0, foot_y0):
+        """Stops a fall at a window top or mascot head crossed on the way from
+        (foot_x0, foot_y0) this tick; the next tick's floor test lands on it. A point
+        test alone misses them once a step is longer than the floor tolerance (low
+        FPS, fast throws). A Jump lands on its own target."""
+        if self.velocity_y <= 0 or self.current_behavior == "Jump":
+            return
+        foot_x1 = self._x_float + self.current_anchor_x
+        foot_y1 = self._y_float + self.current_anchor_y
+        if foot_y1 <= foot_y0:
+            return
+        t = floor = None
+        if self.config.get("interact_windows", True):
+            hit = self.desktop.get_window_crossed(foot_x0, foot_y0, foot_x1, foot_y1, self.window_id())
+            if hit:
+                t, floor = hit[2], hit[1][1]
+        if self.config.get("interact_mascots", True):
+            hit = self.head_crossed(foot_x0, foot_y0, foot_x1, foot_y1)
+            if hit and (t is None or hit[0] < t):
+                t, floor = hit
+        if t is not None:
+            self._x_float = foot_x0 + (foot_x1 - foot_x0) * t - self.current_anchor_x
+            self._y_float = floor - self.current_anchor_y
+
+    def push_window(self, hwnd, dx, was_pushing):
+        """Pushes a window walked into by dx (moved at the end of the frame), if
+        already pushing it last tick or by chance. False if not, or if the window
+        would be pushed off the desktop."""
+        if not self.config.get("move_windows", False):
+            return False
+        if hwnd != was_pushing and self.rng.random() >= PUSH_CHANCE:
+            return False
+        rect = self.desktop.get_window_rect(hwnd)
+        if rect is None or rect[0] + dx < self.topology.min_x or rect[2] + dx > self.topology.max_x:
+            return False
+        self.desktop.request_window_move(hwnd, dx, 0)
+        self.pushing = hwnd
+        return True
+
+    def grab_window(self):
+        """Takes hold of the active window for a FallWithIE/WalkWithIE action, by its
+        bottom corner on the side the mascot faces (IeOffsetX/IeOffsetY from the
+        anchor). False if moving windows is off or the corner is out of reach."""
+        if not self.config.get("move_windows", False) or self.active_window is None:
+            return False
+        hwnd, rect = self.active_window[0], self.active_window[1]
+        offset_x, offset_y = self.runner.params
+        offset_x = offset_x or 0.0
+        offset_y = offset_y or 0.0
+        foot_x = self._x_float + self.current_anchor_x
+        foot_y = self._y_float + self.current_anchor_y
+        # Facing right it holds the left edge, the window extending ahead of it
+        holds_left = self.facing_right
+        gap_x = foot_x - offset_x - rect[0] if holds_left else foot_x + offset_x - rect[2]
+        if abs(gap_x) > GRAB_REACH or abs(foot_y + offset_y - rect[3]) > GRAB_REACH:
+            return False
+        self.carrying = (hwnd, offset_x, offset_y, holds_left)
+        return True
+
+    def move_carried_window(self):
+        """Keeps the held window at the mascot's hands, or flies a thrown one along
+        (moved at the end of the frame). Never takes it off the screen."""
+        hwnd, offset_x, offset_y, holds_left = self.carrying
+        mode = self.current_behavior
+        rect = self.desktop.get_window_rect(hwnd)
+        if rect is None or mode not in ("Carry", "CarryFall", "ThrowWindow"):
+            self.carrying = None # Closed, or let go of
+            return
+        if mode == "ThrowWindow":
+            ts = self.time_scale
+            velocity = self.window_velocity
+            dx = velocity[0] * ts
+            dy = velocity[1] * ts
+            velocity[1] += velocity[2] * ts
+        else:
+            foot_x = self._x_float + self.current_anchor_x
+            dx = foot_x - offset_x - rect[0] if holds_left else foot_x + offset_x - rect[2]
+            dy = self._y_float + self.current_anchor_y + offset_y - rect[3]
+        sl, st, sr, sb = self.tick_screen
+        dx = _toward_bounds(dx, self.topology.min_x - rect[0], self.topology.max_x - rect[2])
+        dy = _toward_bounds(dy, st - rect[1], sb - rect[3])
+        if dx or dy:
+            self.desktop.request_window_move(hwnd, dx, dy)
+
+    # --- Other mascots (found through the desktop's MascotGrid) ---
+
+    def head_y(self):
+        """Where a mascot standing on this one's head has its foot."""
+        return self._y_float + self.current_anchor_y * (1.0 - HEAD_HEIGHT)
+
+    def others_near(self, left, top, right, bottom):
+        """Other mascots (not being dragged) whose foot may be in the rect."""
+        return [m for m in self.desktop.mascot_grid.query(left, top, right, bottom)
+                if m is not self and not m.dragging]
+
+    def carrier_under_foot(self, foot_x, foot_y):
+        """Mascot whose head is within the floor tolerance of the foot, or None."""
+        best = None
+        best_gap = FLOOR_TOLERANCE
+        for other in self.others_near(foot_x - HEAD_HALF_WIDTH, foot_y, foot_x + HEAD_HALF_WIDTH, foot_y + HEAD_SEARCH):
+            if abs(other._x_float + other.current_anchor_x - foot_x) <= HEAD_HALF_WIDTH:
+                gap = abs(foot_y - other.head_y())
+                if gap < best_gap:
+                    best, best_gap = other, gap
+        return best
+
+    def head_crossed(self, x0, y0, x1, y1):
+        """First mascot head the foot crosses moving down from (x0, y0) to (x1, y1),
+        as (t, head_y) with t the fraction of the move at the crossing, or None."""
+        best = None
+        for other in self.others_near(min(x0, x1) - HEAD_HALF_WIDTH, y0, max(x0, x1) + HEAD_HALF_WIDTH, y1 + HEAD_SEARCH):
+            head = other.head_y()
+            if y0 < head <= y1:
+                t = (head - y0) / (y1 - y0)
+                if (abs(x0 + (x1 - x0) * t - other._x_float - other.current_anchor_x) <= HEAD_HALF_WIDTH
+                        and (best is None or t < best[0])):
+                    best = (t, head)
+        return best
+
+    def mascot_ahead(self, foot_x, foot_y, dx):
+        """True if another mascot on the same floor is within BUMP_DISTANCE of the
+        foot in the direction of dx (plus the step itself)."""
+        if not dx:
+            return False
+        reach = BUMP_DISTANCE + abs(dx)
+        left, right = (foot_x, foot_x + reach) if dx > 0 else (foot_x - reach, foot_x)
+        for other in self.others_near(left, foot_y - FLOOR_TOLERANCE, right, foot_y + FLOOR_TOLERANCE):
+            gap = other._x_float + other.current_anchor_x - foot_x
+            if dx < 0:
+                gap = -gap
+            if 0 < gap <= reach and abs(other._y_float + other.current_anchor_y - foot_y) < FLOOR_TOLERANCE:
+                return True
+        return False
+
+    def end_tick(self):
+        """Keeps the animation in line with the movement and moves the widget."""
+        on_floor = self.on_floor
+
+        # Strict Animation State Enforcement
+        # Ensure visual state matches physical state to prevent moonwalking
+        is_moving_horizontally = abs(self.velocity_x) > 0.1
+        
+        # Only enforce for standard floor behaviors
+        if on_floor and self.current_behavior in ["Walk", "Stand", "Sit"]:
+            if is_moving_horizontally:
+                # Physical: Moving. Visual: Must NOT be static.
+                # If current action looks static (Standard Stand/Sit), force the behavior's walk.
+                if not self.looks_moving():
+                     walk = self.runner.action if self.behavior is not None and self.runner.kind == KIND_WALK else "Walk"
+                     self.set_action(walk)
+            else:
+                # Physical: Still. Visual: Must NOT be moving.
+                if self.looks_moving():
+                     self.set_action("Stand")
+
+        # Use rounding for the actual widget move (render() does it when interpolated)
+        if not self.interpolated:
+            self.apply_position()
+
+    def apply_position(self):
+        """Moves the view to the float position."""
+        self.move_view(int(self._x_float), int(self._y_float))
+
+    def render(self, alpha):
+        """Moves the view to where the mascot is `alpha` (0..1) of the way through
+        its last step, so that rendering between physics steps stays smooth."""
+        x, y = self._x_float, self._y_float
+        if alpha < 1.0:
+            x = self.prev_x + (x - self.prev_x) * alpha
+            y = self.prev_y + (y - self.prev_y) * alpha
+        self.move_view(int(x), int(y))
+
+    def move_view(self, x, y):
+        """Moves the view, skipping the move if the pixel position is unchanged."""
+        if (x, y) == self.pos:
+            self.render_stats['moves_skipped'] += 1
+            return
+        self.pos = (x, y)
+        if self.view is not None:
+            self.view.move(x, y)
+        self.render_stats['moves'] += 1
+
+    def set_position(self, x, y):
+        """Syncs the simulation with a view that was moved directly (dragging)."""
+        self._x_float = self.prev_x = float(x)
+        self._y_float = self.prev_y = float(y)
+        self.pos = (x, y)
+
+    def place(self, x, y):
+        """Jumps to a position (no interpolation from the old one) and moves the view."""
+        self._x_float = self.prev_x = float(x)
+        self._y_float = self.prev_y = float(y)
+        self.apply_position()
+
+    def cursor_pos(self):
+        if self.view is not None:
+            return self.view.cursor_pos()
+        return self.env.cursor_x, self.env.cursor_y # Headless: the cursor stays put
+
+    def window_id(self):
+        """The view's window handle, so window queries can skip it (0 when headless)."""
+        return self.view.window_id() if self.view is not None else 0
+
+    def update_animation(self):
+        if not self.current_action: return
+        frames = self.current_action['frames']
+        animations = self.pack.animations.get(self.current_action_name)
+        if animations:
+            frames = self.choose_frames(animations)
+        if not frames: return
+
+        # Strict Animation State Enforcement
+        # Ensure that if we are climbing, we play a climbing action.
+        # If the current action is Walk but behavior is Cling/Climb, force correction.
+        if self.current_behavior in ["Cling", "Climb"] and "Walk" in self.current_action_name:
+             self.set_action("ClimbWall")
+
+        frame = frames[self.frame_index % len(frames)]
+        
+        self.current_anchor_x = frame['ax']
+        self.current_anchor_y = frame['ay']
+
+        if self.view is not None:
+            self.view.show_frame(frame, self.frame_entered)
+        self.frame_entered = False
+
+        # Normalize animation speed?
+        # Duration is in ticks (shimeji spec). 
+        # If we change tick rate, we change animation speed.
+        # We want animation to be constant time.
+        # Duration 5 ticks at 30FPS = 166ms.
+        # At 30FPS (33ms tick), 5 ticks = 165ms.
+        # At 60FPS (16ms tick), 5 ticks = 80ms (too fast).
+        # We should accumulate ticks scaled by time_scale?
+        # self.ticks_in_frame += 1 * ts?
+        self.ticks_in_frame += self.time_scale
+        
+        if self.ticks_in_frame >= frame['duration']:
+            # Keep the remainder so that mascots stepped less often stay in time
+            self.ticks_in_frame -= frame['duration']
+            self.frame_index += 1
+            self.frame_entered = True
+
+    def idle_span(self):
+        """Longest step, in 30 FPS ticks, this mascot can take without skipping an
+        animation frame or overshooting its action's Duration. None unless it is
+        standing or sitting still."""
+        if (self.dragging or not self.on_floor or self.current_behavior not in IDLE_BEHAVIORS
+                or self.velocity_x or self.velocity_y or self.current_action is None):
+            return None
+        durations = [f['duration'] for anim in self.current_action['animations'] for f in anim['frames']]
+        if not durations:
+            return None
+        span = min(durations)
+        if self.behavior is not None and self.runner.duration is not None:
+            span = min(span, self.runner.duration - self.runner.elapsed)
+        return span
+
+    def needs_wake(self):
+        """Cheap check for a mascot skipped at a lower rate: True if something
+        happened that it must react to right away (grabbed, monitors changed, the
+        window or mascot it stands on moved, or the cursor came close)."""
+        if self.dragging or self.desktop.get_topology() is not self.topology:
+            return True
+        carrier = self.carrier
+        if carrier is not None and (carrier.velocity_x or carrier.velocity_y or carrier.dragging):
+            return True
+        if self.current_window is not None:
+            self.desktop.update_cache()
+            if self.desktop.windows_version != self.windows_version:
+                return True
+        cursor_x, cursor_y = self.cursor_pos()
+        return abs(cursor_x - self.foot_x) < WAKE_DISTANCE and abs(cursor_y - self.foot_y) < WAKE_DISTANCE
+
+    def wake(self):
+        """Back to being stepped every frame."""
+        if self.scheduler is not None:
+            self.scheduler.set_divider(self, 1)
+
+    def grab(self):
+        """Picked up by the cursor."""
+        self.wake()
+        self.dragging = True
+        self.current_behavior = "Dragged"
+        self.drag_foot_x = float(self.pos[0] + self.current_anchor_x)
+
+    def release(self, velocity=None):
+        """Let go of, thrown with `velocity` (x, y) or simply dropped."""
+        self.dragging = False
+        if velocity is not None:
+            self.velocity_x = velocity[0] * 1.5 
+            self.velocity_y = velocity[1] * 1.5
+            self.current_behavior = "Thrown"
+        else:
+            self.current_behavior = "Fall"
+            self.velocity_y = 0
+        
+        # Immediate bounds check to prevent floating out of screen
+        x, y = self.pos
+        fx, fy = x + self.current_anchor_x, y + self.current_anchor_y
+        screen = self.desktop.get_screen_at(fx, fy)
+        if fx < screen[0]: x = screen[0] - self.current_anchor_x
+        if fx > screen[2]: x = screen[2] - self.current_anchor_x
+        self.place(x, y)
+
+
+def _toward_bounds(d, low, high):
+    """A move `d` cut short at [low, high] (how far the window may go each way);
+    a window already past a bound can only move back in."""
+    if d < 0:
+        return max(d, min(low, 0))
+    return min(d, max(high, 0))
@@ -0,0 +1,81 @@
+from collections import OrderedDict
+
+DEFAULT_BUDGET_MB = 64
+
+
+class SpriteCache:
+    """Byte-budgeted LRU cache for decoded sprites, shared by every mascot in the process.
+
+    Entries are keyed by (pack hash, image path) and created on first use by the
+    loader passed to get(), which returns (value, size_in_bytes). When the budget is
+    exceeded the least recently used entries are dropped; widgets still showing an
+    evicted sprite keep their own reference to it.
+    """
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_MB * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+
+    def get(self, key, loader):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        value, size = loader()
+        self._entries[key] = (value, size)
+        self.bytes_used += size
+        self._evict()
+        return value
+
+    def set_budget(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._evict()
+
+    def _evict(self):
+        # Always keep the newest entry, even if it alone is over budget
+        while self.bytes_used > self.budget_bytes and len(self._entries) > 1:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.bytes_used -= size
+            self.evictions += 1
+
+    def discard_pack(self, pack_hash):
+        """Drops every sprite belonging to one pack."""
+        for key in [k for k in self._entries if k[0] == pack_hash]:
+            self.bytes_used -= self._entries.pop(key)[1]
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes_used = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes_used,
+            'budget_bytes': self.budget_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+_shared_cache = None
+
+
+def shared_cache():
+    """The process-wide sprite cache."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = SpriteCache()
+    return _shared_cache
@@ -0,0 +1,64 @@
+from monitor_topology import MonitorTopology, FakeMonitorTopology, DEFAULT_SCREEN, FLOOR_OFFSET
+
+LEFT, RIGHT = FakeMonitorTopology.DUAL_1080P
+# A 1280x1024 monitor raised by 200 px, with an 80 px gap after the 1080p one
+GAPPED = [(0, 0, 1920, 1080), (2000, -200, 3280, 824)]
+
+
+def test_shared_edge_belongs_to_both_monitors():
+    topology = FakeMonitorTopology()
+    # x == 1920 is inside both ranges; the first monitor in enumeration order wins
+    assert topology.screen_at(1920, 500) == LEFT
+    assert topology.screen_at(1921, 500) == RIGHT
+    assert topology.screen_at(0, 500) == LEFT
+    assert topology.screen_at(3840, 500) == RIGHT
+
+
+def test_floor_at_edges():
+    topology = FakeMonitorTopology()
+    assert topology.floor_at(0, 0) == 1080 - FLOOR_OFFSET
+    assert topology.floor_at(3840, 0) == 1080 - FLOOR_OFFSET
+    assert (topology.min_x, topology.max_x) == (0, 3840)
+
+
+def test_gap_uses_the_closest_monitor():
+    topology = MonitorTopology(GAPPED)
+    assert topology.screen_at(1950, 500) == GAPPED[0]
+    assert topology.screen_at(1990, 500) == GAPPED[1]
+    assert topology.floor_at(1950, 500) == 1080 - FLOOR_OFFSET
+    assert topology.floor_at(1990, 500) == 824 - FLOOR_OFFSET
+
+
+def test_is_x_in_any_monitor_with_buffer():
+    topology = MonitorTopology(GAPPED)
+    assert topology.is_x_in_any_monitor(1920)
+    assert topology.is_x_in_any_monitor(1924)  # within the 5 px buffer
+    assert not topology.is_x_in_any_monitor(1960)
+    assert topology.is_x_in_any_monitor(1996)
+    assert topology.is_x_in_any_monitor(1960, buffer=50)
+    assert not topology.is_x_in_any_monitor(-10)
+    assert not topology.is_x_in_any_monitor(3290)
+
+
+def test_staggered_monitors():
+    topology = MonitorTopology(GAPPED)
+    # Above the raised monitor's top (within the 100 px leniency) and below its bottom
+    assert topology.screen_at(2500, -250) == GAPPED[1]
+    assert topology.floor_at(2500, -150) == 824 - FLOOR_OFFSET
+    # Below every monitor at that x: the bottom-most floor there
+    assert topology.floor_at(2500, 2000) == 824 - FLOOR_OFFSET
+
+
+def test_stacked_monitors_floor_is_the_one_below():
+    top, bottom = (0, -1080, 1920, 0), (0, 0, 1920, 1080)
+    topology = MonitorTopology([bottom, top])
+    assert topology.floor_at(500, -500) == 0 - FLOOR_OFFSET
+    assert topology.floor_at(500, 500) == 1080 - FLOOR_OFFSET
+    assert topology.screen_at(500, -500) == top
+
+
+def test_no_monitors_falls_back_to_the_default_screen():
+    topology = MonitorTopology([])
+    assert topology.screen_at(5000, 5000) == DEFAULT_SCREEN
+    assert topology.floor_at(5000, 5000) == DEFAULT_SCREEN[3] - FLOOR_OFFSET
+    assert (topology.min_x, topology.max_x) == (DEFAULT_SCREEN[0], DEFAULT_SCREEN[2])
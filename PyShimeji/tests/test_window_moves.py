@@ -0,0 +1,68 @@
+from desktop import Desktop
+from monitor_topology import FakeMonitorTopology
+from window_source import FakeWindowSource
+
+A = (1, (100, 100, 500, 400), "A")
+B = (2, (600, 200, 1000, 600), "B")
+
+
+def make_desktop(windows=(A, B)):
+    source = FakeWindowSource(windows)
+    desktop = Desktop(source, lambda: FakeMonitorTopology.DUAL_1080P)
+    desktop.update_cache()
+    return source, desktop
+
+
+def test_same_direction_takes_largest_move():
+    source, desktop = make_desktop()
+    desktop.request_window_move(1, 3, 0)
+    desktop.request_window_move(1, 7, 0)
+    desktop.request_window_move(1, 5, -2)
+    desktop.request_window_move(1, 0, -4)
+    desktop.flush_window_moves()
+    assert source.move_batches == [[(1, (107, 96, 507, 396))]]
+    assert desktop.get_window_rect(1) == (107, 96, 507, 396)
+
+
+def test_opposite_directions_cancel():
+    source, desktop = make_desktop()
+    desktop.request_window_move(1, 6, 0)
+    desktop.request_window_move(1, -6, 0)
+    desktop.request_window_move(2, 10, 0)
+    desktop.request_window_move(2, -4, 0)
+    desktop.flush_window_moves()
+    assert source.move_batches == [[(2, (606, 200, 1006, 600))]]
+    assert desktop.get_window_rect(1) == A[1]
+
+
+def test_one_batch_per_flush():
+    source, desktop = make_desktop()
+    desktop.request_window_move(1, 5, 0)
+    desktop.request_window_move(2, 0, 5)
+    desktop.flush_window_moves()
+    assert len(source.move_batches) == 1
+    assert sorted(source.move_batches[0]) == [(1, (105, 100, 505, 400)), (2, (600, 205, 1000, 605))]
+    # Nothing pending: no batch at all
+    desktop.flush_window_moves()
+    assert len(source.move_batches) == 1
+    desktop.request_window_move(2, -5, 0)
+    desktop.flush_window_moves()
+    assert source.move_batches[1] == [(2, (595, 205, 995, 605))]
+
+
+def test_cache_matches_desktop_after_flush():
+    source, desktop = make_desktop()
+    desktop.request_window_move(1, 20, 10)
+    desktop.flush_window_moves()
+    desktop.update_cache()
+    assert desktop.get_windows() == source.enumerate()
+    assert source.describe_calls == 1
+
+
+def test_closed_window_is_skipped():
+    source, desktop = make_desktop()
+    desktop.request_window_move(1, 5, 0)
+    source.remove_window(1)
+    desktop.update_cache()
+    desktop.flush_window_moves()
+    assert source.move_batches == []
@@ -0,0 +1,114 @@
+from window_source import WindowTracker, FakeWindowSource
+
+A = (1, (0, 100, 400, 400), "A")
+B = (2, (500, 200, 900, 600), "B")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_tracker(windows=(A, B), live=True):
+    source = FakeWindowSource(windows, live=live)
+    clock = FakeClock()
+    tracker = WindowTracker(source, clock=clock)
+    tracker.refresh()
+    return source, tracker, clock
+
+
+def test_first_refresh_enumerates():
+    source, tracker, _ = make_tracker()
+    assert tracker.windows == [A, B]
+    assert tracker.full_syncs == 1
+    assert source.enumerate_calls == 1
+
+
+def test_create_puts_window_on_top():
+    source, tracker, _ = make_tracker()
+    source.add_window(3, (50, 50, 150, 150), "C")
+    tracker.refresh()
+    assert tracker.windows[0] == (3, (50, 50, 150, 150), "C")
+    assert tracker.windows[1:] == [A, B]
+    assert tracker.full_syncs == 1
+    assert source.enumerate_calls == 1
+
+
+def test_destroy_removes_window():
+    source, tracker, _ = make_tracker()
+    version = tracker.version
+    source.remove_window(1)
+    tracker.refresh()
+    assert tracker.windows == [B]
+    assert tracker.version == version + 1
+    assert len(tracker.edge_index) == 1
+
+
+def test_moves_coalesce_into_one_describe():
+    source, tracker, _ = make_tracker()
+    for x in range(10):
+        source.move_window(2, (500 + x, 200, 900 + x, 600))
+    tracker.refresh()
+    assert tracker.windows[1] == (2, (509, 200, 909, 600), "B")
+    assert source.describe_calls == 1
+    assert tracker.events_applied == 10
+
+
+def test_hide_and_show():
+    source, tracker, _ = make_tracker()
+    source.hide_window(1)
+    tracker.refresh()
+    assert tracker.windows == [B]
+    source.show_window(1)
+    tracker.refresh()
+    assert [w[0] for w in tracker.windows] == [1, 2]
+
+
+def test_filter_drops_moved_window():
+    source = FakeWindowSource([A, B])
+    tracker = WindowTracker(source, window_filter=lambda rect: rect[0] < 1000, clock=FakeClock())
+    tracker.refresh()
+    source.move_window(2, (1500, 200, 1900, 600))
+    tracker.refresh()
+    assert tracker.windows == [A]
+
+
+def test_periodic_full_resync():
+    source, tracker, clock = make_tracker()
+    clock.now = WindowTracker.RESYNC_INTERVAL / 2
+    tracker.refresh()
+    assert tracker.full_syncs == 1
+
+    clock.now = WindowTracker.RESYNC_INTERVAL
+    tracker.refresh()
+    assert tracker.full_syncs == 2
+    assert source.enumerate_calls == 2
+
+
+def test_resync_catches_missed_changes():
+    source, tracker, clock = make_tracker()
+    # A change the source never reported (e.g. a z-order shuffle)
+    source._windows.reverse()
+    tracker.refresh()
+    assert tracker.windows == [A, B]
+    clock.now = WindowTracker.RESYNC_INTERVAL
+    tracker.refresh()
+    assert tracker.windows == [B, A]
+
+
+def test_polls_without_events():
+    source, tracker, clock = make_tracker(live=False)
+    assert not tracker.live
+    clock.now = WindowTracker.POLL_INTERVAL
+    tracker.refresh()
+    assert tracker.full_syncs == 2
+
+
+def test_request_resync():
+    source, tracker, _ = make_tracker()
+    tracker.request_resync()
+    tracker.refresh()
+    assert tracker.full_syncs == 2
@@ -3,89 +3,242 @@ import win32con
 import win32api
 import win32process
 import ctypes
+from ctypes import wintypes
 import time
 import os
 import math
+from desktop import Desktop
+from instruments import shared_instruments
+from window_source import (WindowSource,
+                           CREATE, DESTROY, MOVE, SHOW, HIDE, FOREGROUND)
 
-class WindowManager:
-    _window_cache = []
-    _last_cache_time = 0
-    CACHE_DURATION = 0.5 
+# WinEvent constants (winuser.h)
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_SYSTEM_MINIMIZESTART = 0x0016
+EVENT_SYSTEM_MINIMIZEEND = 0x0017
+EVENT_OBJECT_CREATE = 0x8000
+EVENT_OBJECT_DESTROY = 0x8001
+EVENT_OBJECT_SHOW = 0x8002
+EVENT_OBJECT_HIDE = 0x8003
+EVENT_OBJECT_LOCATIONCHANGE = 0x800B
+EVENT_OBJECT_NAMECHANGE = 0x800C
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+CHILDID_SELF = 0
+GA_ROOT = 2
+SWP_NOZORDER = 0x0004
+SWP_NOACTIVATE = 0x0010
+SWP_NOOWNERZORDER = 0x0200
 
-    @staticmethod
-    def update_cache():
-        """Refreshes the internal list of window rects, excluding PyShimeji itself and fullscreen windows."""
-        now = time.time()
-        if now - WindowManager._last_cache_time < WindowManager.CACHE_DURATION:
+_instruments = shared_instruments()
+
+WinEventProc = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                  wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+
+# HWINEVENTHOOK and HDWP handles are pointer-sized
+_user32 = ctypes.windll.user32
+_user32.SetWinEventHook.argtypes = [wintypes.DWORD, wintypes.DWORD, wintypes.HMODULE, WinEventProc,
+                                    wintypes.DWORD, wintypes.DWORD, wintypes.DWORD]
+_user32.SetWinEventHook.restype = wintypes.HANDLE
+_user32.UnhookWinEvent.argtypes = [wintypes.HANDLE]
+_user32.UnhookWinEvent.restype = wintypes.BOOL
+_user32.BeginDeferWindowPos.argtypes = [ctypes.c_int]
+_user32.BeginDeferWindowPos.restype = wintypes.HANDLE
+_user32.DeferWindowPos.argtypes = [wintypes.HANDLE, wintypes.HWND, wintypes.HWND, ctypes.c_int,
+                                   ctypes.c_int, ctypes.c_int, ctypes.c_int, wintypes.UINT]
+_user32.DeferWindowPos.restype = wintypes.HANDLE
+_user32.EndDeferWindowPos.argtypes = [wintypes.HANDLE]
+_user32.EndDeferWindowPos.restype = wintypes.BOOL
+
+class Win32WindowSource(WindowSource):
+    """Desktop windows via EnumWindows, kept current with out-of-context WinEvent hooks."""
+
+    IGNORED_TITLES = ["Program Manager", "Settings", "Microsoft Text Input Application"]
+
+    EVENT_KINDS = {
+        EVENT_OBJECT_CREATE: CREATE,
+        EVENT_OBJECT_DESTROY: DESTROY,
+        EVENT_OBJECT_SHOW: SHOW,
+        EVENT_OBJECT_HIDE: HIDE,
+        EVENT_OBJECT_LOCATIONCHANGE: MOVE,
+        EVENT_OBJECT_NAMECHANGE: MOVE,  # title may now be (un)blacklisted
+        EVENT_SYSTEM_FOREGROUND: FOREGROUND,
+        EVENT_SYSTEM_MINIMIZESTART: HIDE,
+        EVENT_SYSTEM_MINIMIZEEND: SHOW,
+    }
+    HOOK_RANGES = [
+        (EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_FOREGROUND),
+        (EVENT_SYSTEM_MINIMIZESTART, EVENT_SYSTEM_MINIMIZEEND),
+        (EVENT_OBJECT_CREATE, EVENT_OBJECT_HIDE),
+        (EVENT_OBJECT_LOCATIONCHANGE, EVENT_OBJECT_NAMECHANGE),
+    ]
+
+    def __init__(self):
+        self.my_pid = os.getpid()
+        self._events = []
+        self._hooks = []
+        self._proc = WinEventProc(self._on_event)  # must outlive the hooks
+
+    def start(self):
+        for lo, hi in self.HOOK_RANGES:
+            hook = _user32.SetWinEventHook(lo, hi, None, self._proc, 0, 0,
+                                          WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS)
+            if not hook:
+                self.stop()
+                return False
+            self._hooks.append(hook)
+        return True
+
+    def stop(self):
+        for hook in self._hooks:
+            _user32.UnhookWinEvent(hook)
+        self._hooks = []
+
+    def _on_event(self, hook, event, hwnd, id_object, id_child, thread, time_ms):
+        # Delivered on the GUI thread while Qt pumps messages; only top-level windows matter
+        if hwnd and id_object == OBJID_WINDOW and id_child == CHILDID_SELF:
+            if event == EVENT_OBJECT_DESTROY or _user32.GetAncestor(hwnd, GA_ROOT) == hwnd:
+                self._events.append((self.EVENT_KINDS[event], hwnd))
+
+    def take_events(self):
+        events, self._events = self._events, []
+        return events
+
+    def describe(self, hwnd):
+        if _instruments.enabled:
+            _instruments.count("win32.describe")
+        try:
+            if not win32gui.IsWindow(hwnd) or not win32gui.IsWindowVisible(hwnd):
+                return None
+            if win32gui.IsIconic(hwnd):
+                return None
+            # Exclude windows belonging to our own process
+            _, pid = win32process.GetWindowThreadProcessId(hwnd)
+            if pid == self.my_pid: return None
+            title = win32gui.GetWindowText(hwnd)
+            if not title or title in self.IGNORED_TITLES: return None
+            return (win32gui.GetWindowRect(hwnd), title)
+        except:
+            return None
+
+    def move_windows(self, moves):
+        """Moves the windows in one BeginDeferWindowPos/EndDeferWindowPos batch, so
+        they are repositioned together in a single screen update."""
+        if _instruments.enabled:
+            _instruments.count("win32.DeferWindowPos", len(moves))
+        flags = SWP_NOZORDER | SWP_NOACTIVATE | SWP_NOOWNERZORDER
+        hdwp = _user32.BeginDeferWindowPos(len(moves))
+        for hwnd, (left, top, right, bottom) in moves:
+            if not hdwp:
+                break
+            hdwp = _user32.DeferWindowPos(hdwp, hwnd, None, left, top, right - left, bottom - top, flags)
+        if hdwp and _user32.EndDeferWindowPos(hdwp):
             return
-        
-        my_pid = os.getpid()
-        new_cache = []
-        
-        # Get screen areas for fullscreen detection
-        screens = WindowManager.get_screens_info()
-        
+        # One window refused (closed, or owned by an elevated process): the batch is
+        # dropped, so move the windows one at a time instead
+        for hwnd, (left, top, right, bottom) in moves:
+            try:
+                win32gui.SetWindowPos(hwnd, None, left, top, right - left, bottom - top, flags)
+            except: pass
+
+    def enumerate(self):
+        if _instruments.enabled:
+            _instruments.count("win32.EnumWindows")
+        windows = []
+
         def enum_handler(hwnd, ctx):
-            if win32gui.IsWindowVisible(hwnd):
+            # Same filter as describe(): minimized windows aren't tracked
+            if win32gui.IsWindowVisible(hwnd) and not win32gui.IsIconic(hwnd):
                 # Exclude windows belonging to our own process
                 _, pid = win32process.GetWindowThreadProcessId(hwnd)
-                if pid == my_pid: return
-                
+                if pid == self.my_pid: return
+
                 title = win32gui.GetWindowText(hwnd)
-                if title and title not in ["Program Manager", "Settings", "Microsoft Text Input Application"]:
+                if title and title not in self.IGNORED_TITLES:
                     try:
-                        rect = win32gui.GetWindowRect(hwnd)
-                        w = rect[2] - rect[0]
-                        h = rect[3] - rect[1]
-                        
-                        if w > 50 and h > 50:
-                            # Check if fullscreen (covers any monitor)
-                            is_fullscreen = False
-                            for s in screens:
-                                # Fullscreen window matches or exceeds monitor bounds
-                                # We use a small tolerance or just >= check
-                                if rect[0] <= s[0] and rect[1] <= s[1] and rect[2] >= s[2] and rect[3] >= s[3]:
-                                    is_fullscreen = True
-                                    break
-                            
-                            if not is_fullscreen:
-                                new_cache.append((hwnd, rect, title))
+                        windows.append((hwnd, win32gui.GetWindowRect(hwnd), title))
                     except: pass
-        
+
         win32gui.EnumWindows(enum_handler, None)
-        WindowManager._window_cache = new_cache
-        WindowManager._last_cache_time = now
+        return windows
+
+class WindowManager:
+    """The real desktop: a shared Desktop fed by Win32 monitor enumeration and
+    Win32WindowSource, behind the static API the widgets use."""
+
+    _desktop = None
+
+    @staticmethod
+    def desktop():
+        if WindowManager._desktop is None:
+            WindowManager._desktop = Desktop(Win32WindowSource(), WindowManager.query_screens)
+        return WindowManager._desktop
+
+    @staticmethod
+    def is_trackable(rect):
+        """Size and fullscreen filter applied to every tracked window."""
+        return WindowManager.desktop().is_trackable(rect)
+
+    @staticmethod
+    def set_window_source(source):
+        """Swaps the window backend (e.g. a FakeWindowSource); the cache is rebuilt from it."""
+        WindowManager.desktop().set_window_source(source)
+
+    @staticmethod
+    def get_tracker():
+        return WindowManager.desktop().get_tracker()
+
+    @staticmethod
+    def shutdown():
+        """Removes the event hooks."""
+        if WindowManager._desktop is not None:
+            WindowManager._desktop.shutdown()
+
+    @staticmethod
+    def update_cache():
+        WindowManager.desktop().update_cache()
 
     @staticmethod
     def get_windows():
-        WindowManager.update_cache()
-        return WindowManager._window_cache
+        return WindowManager.desktop().get_windows()
 
     @staticmethod
     def get_window_under_foot(foot_x, foot_y, current_hwnd_to_ignore, velocity_y=0):
-        # Only snap if falling
-        if velocity_y < 0: return None
-        
-        WindowManager.update_cache()
-        for hwnd, rect, title in WindowManager._window_cache:
-            if hwnd == current_hwnd_to_ignore: continue
-            left, top, right, bottom = rect
-            if left <= foot_x <= right:
-                if abs(foot_y - top) < 15:
-                    return (hwnd, rect)
-        return None
+        return WindowManager.desktop().get_window_under_foot(foot_x, foot_y, current_hwnd_to_ignore, velocity_y)
+
+    @staticmethod
+    def get_window_crossed(x0, y0, x1, y1, current_hwnd_to_ignore):
+        return WindowManager.desktop().get_window_crossed(x0, y0, x1, y1, current_hwnd_to_ignore)
 
     @staticmethod
     def move_window(hwnd, dx, dy):
+        """Moves a window by (dx, dy) at the end of the frame (see Desktop.request_window_move)."""
+        WindowManager.desktop().request_window_move(hwnd, dx, dy)
+
+    @staticmethod
+    def flush_window_moves():
+        WindowManager.desktop().flush_window_moves()
+
+    @staticmethod
+    def set_click_through(hwnd, enabled):
+        """Lets mouse input pass through a translucent top-level window (WS_EX_TRANSPARENT), or not."""
+        if _instruments.enabled:
+            _instruments.count("win32.SetWindowLong")
         try:
-            rect = win32gui.GetWindowRect(hwnd)
-            x, y = rect[0], rect[1]
-            w, h = rect[2] - rect[0], rect[3] - rect[1]
-            win32gui.MoveWindow(hwnd, x + dx, y + dy, w, h, True)
+            style = win32gui.GetWindowLong(hwnd, win32con.GWL_EXSTYLE)
+            if enabled:
+                style |= win32con.WS_EX_LAYERED | win32con.WS_EX_TRANSPARENT
+            else:
+                style &= ~win32con.WS_EX_TRANSPARENT
+            win32gui.SetWindowLong(hwnd, win32con.GWL_EXSTYLE, style)
         except: pass
 
     @staticmethod
-    def get_screens_info():
+    def query_screens():
+        """Enumerates monitor rects from the system. Prefer get_topology(), which caches this."""
+        if _instruments.enabled:
+            _instruments.count("win32.EnumDisplayMonitors")
         screens = []
         monitors = win32api.EnumDisplayMonitors()
         for monitor in monitors:
@@ -93,88 +246,37 @@ class WindowManager:
             screens.append(info['Monitor'])
         return screens
 
+    @staticmethod
+    def get_topology():
+        """Returns the cached monitor layout, building it on first use or after invalidation."""
+        return WindowManager.desktop().get_topology()
+
+    @staticmethod
+    def set_topology(topology):
+        """Replaces the monitor layout (e.g. with a FakeMonitorTopology)."""
+        WindowManager.desktop().set_topology(topology)
+
+    @staticmethod
+    def invalidate_topology():
+        """Drops the cached layout; called when screens are added, removed or resized."""
+        WindowManager.desktop().invalidate_topology()
+
+    @staticmethod
+    def get_screens_info():
+        return WindowManager.desktop().get_screens_info()
+
     @staticmethod
     def get_screen_at(x, y):
-        screens = WindowManager.get_screens_info()
-        if not screens: return (0, 0, 1920, 1080)
-        for s in screens:
-            # Lenient vertical check (100px buffer) to handle staggered monitors
-            if s[0] <= x <= s[2] and s[1]-100 <= y <= s[3]+100:
-                return s
-        
-        # If not inside any, return the closest one horizontally
-        def horiz_dist(px, rect):
-            if rect[0] <= px <= rect[2]: return 0
-            return min(abs(rect[0] - px), abs(rect[2] - px))
-        
-        return min(screens, key=lambda s: horiz_dist(x, s))
+        return WindowManager.desktop().get_screen_at(x, y)
 
     @staticmethod
     def get_floor_at(x, y):
-        screens = WindowManager.get_screens_info()
-        if not screens: return 1080 - 50
-        
-        # Find all screens that contain this X coordinate
-        candidates = [s for s in screens if s[0] <= x <= s[2]]
-        
-        if not candidates:
-            # In a gap? Use the closest screen horizontally
-            def horiz_dist(px, rect):
-                if rect[0] <= px <= rect[2]: return 0
-                return min(abs(rect[0] - px), abs(rect[2] - px))
-            closest = min(screens, key=lambda s: horiz_dist(x, s))
-            return closest[3] - 50
-        
-        # Of the candidates that share this X, find the one that actually contains Y,
-        # or the first one whose top is below Y (the one we would fall onto).
-        candidates.sort(key=lambda s: s[1])
-        
-        # Default to the bottom-most floor in case we're below all screens
-        best_floor = candidates[-1][3] - 50 
-        
-        for s in candidates:
-            if s[1] <= y <= s[3]:
-                # We are inside this screen's vertical range
-                return s[3] - 50
-            if s[1] > y:
-                # This screen is below us; it's the next floor we'd hit
-                return s[3] - 50
-                
-        return best_floor
+        return WindowManager.desktop().get_floor_at(x, y)
 
     @staticmethod
     def is_x_in_any_monitor(x, buffer=5):
-        screens = WindowManager.get_screens_info()
-        for s in screens:
-            if s[0] - buffer <= x <= s[2] + buffer:
-                return True
-        return False
-
-    @staticmethod
-    def get_vertical_wall_collision(x, y, dx, current_hwnd_to_ignore):
-        screens = WindowManager.get_screens_info()
-        WindowManager.update_cache()
-        target_x = x + dx
-        
-        # Check if target_x is within ANY monitor's X-range (the "Sky")
-        # Use a small buffer to handle rounding/tiny gaps
-        found_next_space = WindowManager.is_x_in_any_monitor(target_x, buffer=5)
-        
-        if not found_next_space:
-            curr_s = WindowManager.get_screen_at(x, y)
-            # Check if we are above the monitor (Sky)
-            is_sky = y < curr_s[1]
-            # Return: (Side, X, is_sky, is_window)
-            if dx < 0: return ('Left', curr_s[0], is_sky, False)
-            else: return ('Right', curr_s[2], is_sky, False)
-
-        # Window Edges from Cache (Only if NOT in sky)
-        margin = 25
-        for hwnd, rect, title in WindowManager._window_cache:
-            if hwnd == current_hwnd_to_ignore: continue
-            left, top, right, bottom = rect
-            # Vertical overlap check
-            if top < y < bottom:
-                if dx > 0 and abs(x - left) < margin: return ('Right', left, False, True)
-                if dx < 0 and abs(x - right) < margin: return ('Left', right, False, True)
-        return None
+        return WindowManager.desktop().is_x_in_any_monitor(x, buffer)
+
+    @staticmethod
+    def get_vertical_wall_collision(x, y, dx, current_hwnd_to_ignore, dy=0):
+        return WindowManager.desktop().get_vertical_wall_collision(x, y, dx, current_hwnd_to_ignore, dy)
@@ -0,0 +1,235 @@
+import time
+from abc import ABC, abstractmethod
+from edge_index import EdgeIndex
+
+# Event kinds a WindowSource reports (mirroring the WinEvent hooks)
+CREATE = 'create'
+DESTROY = 'destroy'
+MOVE = 'move'
+SHOW = 'show'
+HIDE = 'hide'
+FOREGROUND = 'foreground'
+
+
+class WindowSource(ABC):
+    """Interface for whatever tells the WindowTracker about top-level windows.
+
+    A source enumerates eligible windows ((hwnd, rect, title), topmost first),
+    describes a single window on demand and queues (kind, hwnd) events as windows
+    are created, destroyed, moved, shown, hidden or brought to the front. It also
+    moves windows, a batch at a time.
+    """
+
+    def start(self):
+        """Begins event delivery. Returns False if only enumeration is available."""
+        return False
+
+    def stop(self):
+        pass
+
+    @abstractmethod
+    def enumerate(self):
+        """Eligible windows as (hwnd, rect, title), topmost first."""
+
+    @abstractmethod
+    def describe(self, hwnd):
+        """Current (rect, title) of an eligible window, or None if it should not be tracked."""
+
+    def take_events(self):
+        """Returns and clears the events queued since the last call."""
+        return []
+
+    @abstractmethod
+    def move_windows(self, moves):
+        """Moves windows together: `moves` is a list of (hwnd, new rect)."""
+
+
+class WindowTracker:
+    """Window cache kept up to date from a WindowSource's events.
+
+    Events only mark windows dirty; each refresh describes every dirty window once
+    and patches the cache, so an idle desktop costs nothing and a burst of move
+    events for one window costs a single query. A full enumeration still runs every
+    RESYNC_INTERVAL seconds (or POLL_INTERVAL if the source has no events) to catch
+    anything the events missed, such as z-order changes.
+    """
+
+    RESYNC_INTERVAL = 10.0
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, source, window_filter=None, clock=time.monotonic):
+        self.source = source
+        self.window_filter = window_filter
+        self.clock = clock
+        self.windows = []  # (hwnd, rect, title), topmost first
+        self.edge_index = EdgeIndex()
+        self.version = 0  # bumped whenever the cache changes
+        self.full_syncs = 0
+        self.events_applied = 0
+        self.live = bool(source.start())
+        self._last_sync = None
+
+    def stop(self):
+        self.source.stop()
+        self.live = False
+
+    def request_resync(self):
+        """Makes the next refresh do a full enumeration."""
+        self._last_sync = None
+
+    def refresh(self, force=False):
+        now = self.clock()
+        interval = self.RESYNC_INTERVAL if self.live else self.POLL_INTERVAL
+        if force or self._last_sync is None or now - self._last_sync >= interval:
+            self.source.take_events()  # covered by the enumeration
+            self.full_sync(now)
+        else:
+            self.apply_events(self.source.take_events())
+
+    def _accepts(self, rect):
+        return self.window_filter is None or self.window_filter(rect)
+
+    def full_sync(self, now=None):
+        windows = [w for w in self.source.enumerate() if self._accepts(w[1])]
+        self._last_sync = self.clock() if now is None else now
+        self.full_syncs += 1
+        if windows != self.windows:
+            self._set_windows(windows)
+
+    def apply_events(self, events):
+        if not events:
+            return
+        self.events_applied += len(events)
+
+        # Coalesce: last event per window decides, but bringing to front is kept
+        latest = {}
+        raised = []
+        for kind, hwnd in events:
+            if kind == FOREGROUND:
+                raised.append(hwnd)
+            latest[hwnd] = kind
+
+        windows = self.windows
+        positions = {w[0]: i for i, w in enumerate(windows)}
+        updated = list(windows)
+        removed = set()
+        added = []
+        for hwnd, kind in latest.items():
+            info = None
+            if kind not in (DESTROY, HIDE):
+                info = self.source.describe(hwnd)
+                if info is not None and not self._accepts(info[0]):
+                    info = None
+            i = positions.get(hwnd)
+            if info is None:
+                if i is not None:
+                    removed.add(hwnd)
+            elif i is None:
+                added.append((hwnd, info[0], info[1]))
+            else:
+                updated[i] = (hwnd, info[0], info[1])
+
+        # New windows appear on top, as do raised ones
+        front = {hwnd for hwnd in raised if hwnd in positions and hwnd not in removed}
+        head = added + [w for w in updated if w[0] in front]
+        rest = [w for w in updated if w[0] not in removed and w[0] not in front]
+        new_windows = head + rest
+        if new_windows != windows:
+            self._set_windows(new_windows)
+
+    def apply_moves(self, moves):
+        """Patches the cache with the windows just moved by this process ({hwnd: rect})
+        instead of waiting for their move events."""
+        windows = self.windows
+        updated = [(hwnd, moves.get(hwnd, rect), title) for hwnd, rect, title in windows]
+        if updated != windows:
+            self._set_windows(updated)
+
+    def stats(self):
+        return {
+            'windows': len(self.windows),
+            'live': self.live,
+            'full_syncs': self.full_syncs,
+            'events_applied': self.events_applied,
+            'version': self.version,
+        }
+
+    def _set_windows(self, windows):
+        self.windows = windows
+        self.edge_index = EdgeIndex(windows)
+        self.version += 1
+
+
+class FakeWindowSource(WindowSource):
+    """In-memory desktop for exercising the tracker without a window system.
+
+    Mutations update the fake desktop and queue the same events a real source
+    would. Counts enumerations and describes, and records every move_windows()
+    batch, so tests can check the cost.
+    """
+
+    def __init__(self, windows=(), live=True):
+        self._windows = [(hwnd, tuple(rect), title) for hwnd, rect, title in windows]
+        self._hidden = set()
+        self._events = []
+        self._live = live
+        self.enumerate_calls = 0
+        self.describe_calls = 0
+        self.move_batches = [] # Each move_windows() call's list of (hwnd, rect)
+
+    def start(self):
+        return self._live
+
+    def enumerate(self):
+        self.enumerate_calls += 1
+        return [w for w in self._windows if w[0] not in self._hidden]
+
+    def describe(self, hwnd):
+        self.describe_calls += 1
+        if hwnd in self._hidden:
+            return None
+        for h, rect, title in self._windows:
+            if h == hwnd:
+                return (rect, title)
+        return None
+
+    def take_events(self):
+        events, self._events = self._events, []
+        return events
+
+    def _find(self, hwnd):
+        for i, w in enumerate(self._windows):
+            if w[0] == hwnd:
+                return i
+        raise KeyError(hwnd)
+
+    def add_window(self, hwnd, rect, title="Window"):
+        self._windows.insert(0, (hwnd, tuple(rect), title))
+        self._events.append((CREATE, hwnd))
+
+    def remove_window(self, hwnd):
+        del self._windows[self._find(hwnd)]
+        self._hidden.discard(hwnd)
+        self._events.append((DESTROY, hwnd))
+
+    def move_window(self, hwnd, rect):
+        i = self._find(hwnd)
+        self._windows[i] = (hwnd, tuple(rect), self._windows[i][2])
+        self._events.append((MOVE, hwnd))
+
+    def move_windows(self, moves):
+        self.move_batches.append(list(moves))
+        for hwnd, rect in moves:
+            self.move_window(hwnd, rect)
+
+    def hide_window(self, hwnd):
+        self._hidden.add(hwnd)
+        self._events.append((HIDE, hwnd))
+
+    def show_window(self, hwnd):
+        self._hidden.discard(hwnd)
+        self._events.append((SHOW, hwnd))
+
+    def raise_window(self, hwnd):
+        self._windows.insert(0, self._windows.pop(self._find(hwnd)))
+        self._events.append((FOREGROUND, hwnd))